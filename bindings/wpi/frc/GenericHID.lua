@@ -38,10 +38,33 @@ GenericHID.HIDType = {
   kHID1stPerson = 24
 }
 
+local kJoystickPorts = DriverStation.getJoystickPorts()
+
+-- Every joystick, read in one FFI call per loop by refreshSnapshots()
+local snapshots = DriverStation.StickSnapshot(kJoystickPorts)
+-- DriverStation.refreshCount the snapshots were taken at, false if never
+local snapshotsAt = false
+DriverStation.refreshCount = DriverStation.refreshCount or 0
+
+---Snapshot all joysticks so reads don't cross the FFI once per call.
+---IterativeRobotBase calls this every loop after DriverStation.refreshData().
+---Snapshots are only used until the next DriverStation.refreshData(), reads
+---go straight to the DriverStation before this is called again.
+---
+---Reads out of a joystick's range also go to the DriverStation, so it still
+---reports the missing button, axis or POV.
+function GenericHID.refreshSnapshots()
+  DriverStation.getStickSnapshots(snapshots, kJoystickPorts)
+  snapshotsAt = DriverStation.refreshCount
+end
+
 ---Initialize a GenericHID device
 ---@param port number The joystick port (0-5)
 function GenericHID.init(self, port)
   self._port = port
+  if type(port) == 'number' and port >= 0 and port < kJoystickPorts then
+    self._snapshot = snapshots[port]
+  end
   self._outputs = 0
   self._leftRumble = 0
   self._rightRumble = 0
@@ -60,6 +83,10 @@ end
 ---@param button number Button index (starting at 1)
 ---@return boolean True if the button is pressed
 function GenericHID:getRawButton(button)
+  local s = snapshotsAt == DriverStation.refreshCount and self._snapshot
+  if s and button >= 1 and button <= s.buttonCount then
+    return bit.band(s.buttons, bit.lshift(1, button - 1)) ~= 0
+  end
   return DriverStation.getStickButton(self._port, button)
 end
 
@@ -81,6 +108,10 @@ end
 ---@param axis number The axis to read, starting at 0
 ---@return number The value of the axis
 function GenericHID:getRawAxis(axis)
+  local s = snapshotsAt == DriverStation.refreshCount and self._snapshot
+  if s and axis >= 0 and axis < s.axisCount then
+    return s.axes[axis]
+  end
   return DriverStation.getStickAxis(self._port, axis)
 end
 
@@ -89,24 +120,40 @@ end
 ---@return number The angle of the POV in degrees, or -1 if the POV is not pressed
 function GenericHID:getPOV(pov)
   pov = pov or 0
+  local s = snapshotsAt == DriverStation.refreshCount and self._snapshot
+  if s and pov >= 0 and pov < s.povCount then
+    return s.povs[pov]
+  end
   return DriverStation.getStickPOV(self._port, pov)
 end
 
 ---Get the number of axes for the HID
 ---@return number The number of axes
 function GenericHID:getAxisCount()
+  local s = snapshotsAt == DriverStation.refreshCount and self._snapshot
+  if s then
+    return s.axisCount
+  end
   return DriverStation.getStickAxisCount(self._port)
 end
 
 ---Get the number of POVs for the HID
 ---@return number The number of POVs
 function GenericHID:getPOVCount()
+  local s = snapshotsAt == DriverStation.refreshCount and self._snapshot
+  if s then
+    return s.povCount
+  end
   return DriverStation.getStickPOVCount(self._port)
 end
 
 ---Get the number of buttons for the HID
 ---@return number The number of buttons
 function GenericHID:getButtonCount()
+  local s = snapshotsAt == DriverStation.refreshCount and self._snapshot
+  if s then
+    return s.buttonCount
+  end
   return DriverStation.getStickButtonCount(self._port)
 end
 
@@ -7,6 +7,7 @@ local ntcore = require('wpi.clib.ntcore')
 local wpiHal = require('wpi.clib.wpiHal')
 
 local DriverStation = require('wpi.frc.DriverStation')
+local GenericHID = require('wpi.frc.GenericHID')
 local LiveWindow = require('wpi.frc.livewindow.LiveWindow')
 local RobotBase = require('wpi.frc.RobotBase')
 local Shuffleboard = require('wpi.frc.shuffleboard.Shuffleboard')
@@ -121,6 +122,7 @@ function IterativeRobotBase.init(self, seconds)
 
     function self:loopFunc()
         DriverStation.refreshData()
+        GenericHID.refreshSnapshots()
         watchdog:reset()
 
         HC.HAL_GetControlWord(word)
@@ -1,7 +0,0 @@
----SPDX-FileCopyrightText: Michael Fisher @mfisher31
----SPDX-License-Identifier: MIT
-
----Translation3d wrapper
----@class Translation3d
-local Translation3d = {}
-return Translation3d
@@ -8,10 +8,12 @@
 extern "C" {
 #endif
 
+#include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
 
 #include <lua.h>
+#include <lauxlib.h>
 
 // Define export macro for FFI functions on Windows
 #ifdef _WIN32
@@ -37,6 +39,184 @@ static void luabot_set_default_paths (lua_State* L) {
     }
 }
 
+// Bytecode bundles are built per platform (vendordep.py --target), since
+// the roboRIO's LuaJIT and desktop GC64 builds can't load each other's.
+#ifndef LUABOT_BUNDLE_TARGET
+#    if defined(__FRC_ROBORIO__)
+#        define LUABOT_BUNDLE_TARGET "linuxathena"
+#    elif defined(_WIN64)
+#        define LUABOT_BUNDLE_TARGET "windowsx86-64"
+#    elif defined(__APPLE__)
+#        define LUABOT_BUNDLE_TARGET "osxuniversal"
+#    elif defined(__linux__) && defined(__x86_64__)
+#        define LUABOT_BUNDLE_TARGET "linuxx86-64"
+#    endif
+#endif
+
+#if ! defined(LUABOT_BUNDLE_MODULE) && defined(LUABOT_BUNDLE_TARGET)
+#    define LUABOT_BUNDLE_MODULE "luabot.bundle." LUABOT_BUNDLE_TARGET
+#endif
+
+// Registers package.preload loaders from this platform's precompiled
+// bytecode bundle, if one is installed, so later requires skip the parser
+// and path search. Without a bundle modules keep loading from source.
+static void luabot_load_bundle (lua_State* L) {
+#ifndef LUABOT_BUNDLE_MODULE
+    (void) L;
+#else
+    lua_getglobal (L, "require");
+    lua_pushstring (L, LUABOT_BUNDLE_MODULE);
+    if (lua_pcall (L, 1, 0, 0) != 0) {
+        const char* err = lua_tostring (L, -1);
+        if (err != NULL && strstr (err, "not found") == NULL)
+            fprintf (stderr, "luabot: ignoring %s: %s\n", LUABOT_BUNDLE_MODULE, err);
+        lua_pop (L, 1);
+    }
+#endif
+}
+
+#ifndef LUABOT_IMAGE_EXT
+#    define LUABOT_IMAGE_EXT ".luabot"
+#endif
+
+// Robot images, written by vendordep/robotimage.py: a 16 byte header
+// ("LUABOTIM", version, count), then count index entries of four uint32
+// (name offset, name length, chunk offset, chunk length), little endian.
+// Entry 0 is the robot, the rest are modules sorted by name.
+#define LUABOT_IMAGE_MAGIC   "LUABOTIM"
+#define LUABOT_IMAGE_VERSION 1
+#define LUABOT_IMAGE_HEADER  16
+#define LUABOT_IMAGE_ENTRY   16
+
+static int luabot_is_image (const char* path) {
+    size_t len = strlen (path);
+    size_t ext = strlen (LUABOT_IMAGE_EXT);
+    return len > ext && strcmp (path + len - ext, LUABOT_IMAGE_EXT) == 0;
+}
+
+static unsigned int luabot_image_u32 (const unsigned char* p) {
+    return (unsigned int) p[0] | ((unsigned int) p[1] << 8)
+           | ((unsigned int) p[2] << 16) | ((unsigned int) p[3] << 24);
+}
+
+static const unsigned char* luabot_image_entry (const unsigned char* image, unsigned int i) {
+    return image + LUABOT_IMAGE_HEADER + (size_t) i * LUABOT_IMAGE_ENTRY;
+}
+
+static int luabot_image_load_chunk (lua_State* L, const unsigned char* image, unsigned int i) {
+    const unsigned char* e = luabot_image_entry (image, i);
+    const char* name       = (const char*) image + luabot_image_u32 (e);
+    int status;
+    lua_pushliteral (L, "@");
+    lua_pushlstring (L, name, luabot_image_u32 (e + 4));
+    lua_concat (L, 2);
+    status = luaL_loadbuffer (L, (const char*) image + luabot_image_u32 (e + 8),
+                              luabot_image_u32 (e + 12), lua_tostring (L, -1));
+    lua_remove (L, -2);
+    return status;
+}
+
+// package.loaders entry resolving require from the image in upvalue 1
+static int luabot_image_searcher (lua_State* L) {
+    size_t len;
+    const char* name           = luaL_checklstring (L, 1, &len);
+    const unsigned char* image = (const unsigned char*) lua_touserdata (L, lua_upvalueindex (1));
+    unsigned int lo            = 1;
+    unsigned int hi            = luabot_image_u32 (image + 12);
+
+    while (lo < hi) {
+        unsigned int mid       = lo + (hi - lo) / 2;
+        const unsigned char* e = luabot_image_entry (image, mid);
+        size_t elen            = luabot_image_u32 (e + 4);
+        int cmp                = memcmp (name, image + luabot_image_u32 (e), len < elen ? len : elen);
+        if (cmp == 0)
+            cmp = len < elen ? -1 : (len > elen ? 1 : 0);
+        if (cmp == 0) {
+            if (luabot_image_load_chunk (L, image, mid) != 0)
+                return luaL_error (L, "error loading module '%s' from robot image:\n\t%s",
+                                   name, lua_tostring (L, -1));
+            return 1;
+        }
+        if (cmp < 0)
+            hi = mid;
+        else
+            lo = mid + 1;
+    }
+
+    lua_pushfstring (L, "\n\tno module '%s' in robot image", name);
+    return 1;
+}
+
+static int luabot_image_valid (const unsigned char* image, size_t size) {
+    unsigned int count, i;
+    if (size < LUABOT_IMAGE_HEADER || memcmp (image, LUABOT_IMAGE_MAGIC, 8) != 0
+        || luabot_image_u32 (image + 8) != LUABOT_IMAGE_VERSION)
+        return 0;
+    count = luabot_image_u32 (image + 12);
+    if (count < 1 || count > (size - LUABOT_IMAGE_HEADER) / LUABOT_IMAGE_ENTRY)
+        return 0;
+    for (i = 0; i < count; ++i) {
+        const unsigned char* e = luabot_image_entry (image, i);
+        if (luabot_image_u32 (e) > size || luabot_image_u32 (e + 4) > size - luabot_image_u32 (e)
+            || luabot_image_u32 (e + 8) > size || luabot_image_u32 (e + 12) > size - luabot_image_u32 (e + 8))
+            return 0;
+    }
+    return 1;
+}
+
+// Like luaL_loadfile for a robot image: reads it in one go, puts its
+// searcher after package.preload so bundled modules skip the package.path
+// search, and pushes the robot chunk. On error pushes a message instead
+// and returns non zero.
+static int luabot_loadimage (lua_State* L, const char* path) {
+    FILE* f = fopen (path, "rb");
+    unsigned char* image;
+    long size;
+    size_t i;
+    int status;
+
+    if (f == NULL) {
+        lua_pushfstring (L, "cannot open %s", path);
+        return LUA_ERRFILE;
+    }
+    if (fseek (f, 0, SEEK_END) != 0 || (size = ftell (f)) < 0 || fseek (f, 0, SEEK_SET) != 0) {
+        fclose (f);
+        lua_pushfstring (L, "cannot read %s", path);
+        return LUA_ERRFILE;
+    }
+
+    // Owned by the searcher closure, chunks are loaded from it in place
+    image = (unsigned char*) lua_newuserdata (L, (size_t) size);
+    if (fread (image, 1, (size_t) size, f) != (size_t) size) {
+        fclose (f);
+        lua_pop (L, 1);
+        lua_pushfstring (L, "cannot read %s", path);
+        return LUA_ERRFILE;
+    }
+    fclose (f);
+    if (! luabot_image_valid (image, (size_t) size)) {
+        lua_pop (L, 1);
+        lua_pushfstring (L, "%s is not a luabot image", path);
+        return LUA_ERRFILE;
+    }
+
+    lua_getglobal (L, "package");
+    lua_getfield (L, -1, "loaders");
+    lua_remove (L, -2);
+    for (i = lua_objlen (L, -1); i >= 2; --i) {
+        lua_rawgeti (L, -1, (int) i);
+        lua_rawseti (L, -2, (int) i + 1);
+    }
+    lua_pushvalue (L, -2);
+    lua_pushcclosure (L, luabot_image_searcher, 1);
+    lua_rawseti (L, -2, 2);
+    lua_pop (L, 1);
+
+    status = luabot_image_load_chunk (L, image, 0);
+    lua_remove (L, -2);
+    return status;
+}
+
 #ifdef __cplusplus
 }
 #endif
@@ -44,6 +44,11 @@ void run_lua_robot (std::mutex& m, lua_State** L_ptr, const char* lua_file) {
         lua_pushstring (L, new_path.c_str());
         lua_setfield (L, -2, "path");
         lua_pop (L, 1);
+#else
+        // Development builds load build/lua directly, never a stale bundle.
+        // An image carries the modules it was built with.
+        if (! luabot_is_image (lua_file))
+            luabot_load_bundle (L);
 #endif
 
         {
@@ -51,8 +56,10 @@ void run_lua_robot (std::mutex& m, lua_State** L_ptr, const char* lua_file) {
             *L_ptr = L;
         }
 
-        // Load and execute the Lua file as a module
-        if (luaL_loadfile (L, lua_file) != 0) {
+        // Load and execute the Lua file, or robot image, as a module
+        int status = luabot_is_image (lua_file) ? luabot_loadimage (L, lua_file)
+                                                : luaL_loadfile (L, lua_file);
+        if (status != 0) {
             const char* err     = lua_tostring (L, -1);
             std::string err_msg = err ? err : "unknown error";
             throw std::runtime_error (err_msg);
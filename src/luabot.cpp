@@ -79,7 +79,7 @@ int main (int argc, char* argv[]) {
     if (opts.command == luabot::Command::sim) {
         if (opts.lua_file.empty()) {
             std::cerr << "Error: sim command requires a Lua file to be specified" << std::endl;
-            std::cerr << "Usage: luabot sim <robot.lua>" << std::endl;
+            std::cerr << "Usage: luabot sim <robot.lua|robot.luabot>" << std::endl;
             return 1;
         }
         init_simulation();
@@ -3,10 +3,38 @@
 # SPDX-License-Identifier: MIT
 
 """
-Benchmark comparison between plusone.lua and plusone.cpp
+Benchmark comparison between paired Lua and C++ workloads
 Uses Python's subprocess and time modules for accurate measurements
+
+A workload is a <name>.lua script in this directory with a matching
+<name>.cpp built as the test/<name> target. Use --list to see them and
+--only to run a subset.
+
+Each command gets warmup runs, then runs until the 95% confidence interval
+of its mean is narrow enough. Outliers are rejected by median absolute
+deviation, and the Lua/C++ ratio is reported with a bootstrap 95% CI.
+
+--json writes the results and the machine they ran on to a file, and
+--compare checks them against a stored baseline, exiting nonzero when a
+workload regresses by more than --threshold beyond its confidence interval.
+
+With --startup, times every require in requireall.lua instead, broken
+down by module into ffi.cdef, ffi.load and ffi.metatype cost.
+
+With --jitter, runs jitter/JitterRobot.lua under `luabot sim` and the
+test/jitter C++ robot for --seconds each, and reports loop time
+percentiles, start-to-start period and period overruns, loops that took
+longer than the JITTER_PERIOD both robots run at. Mean loop time is
+stored and compared like any other workload, the rest goes under
+'jitter'. --histogram writes both loop time distributions as CSV.
 """
 
+import argparse
+import array
+import json
+import math
+import platform
+import random
 import subprocess
 import time
 import statistics
@@ -16,72 +44,572 @@ from pathlib import Path
 SCRIPT_DIR = Path(__file__).parent
 BUILD_DIR = SCRIPT_DIR.parent / "build"
 RUNS = 10
+MAX_RUNS = 50
+WARMUP = 2
+CI_TARGET = 0.02
+CONFIDENCE = 0.95
+OUTLIER_K = 3.5
+BOOTSTRAP_RESAMPLES = 10000
+JITTER_SECONDS = 10
+# TimedRobot's default loop period, passed to both jitter robots
+JITTER_PERIOD = 0.02
+# A start this many periods after the previous one counts as late
+JITTER_LATE_PERIODS = 1.5
+# Hundreds of loops per run, so fewer bootstrap resamples for the ratio CI
+JITTER_RESAMPLES = 1000
+JITTER_BIN_MS = 0.05
+JITTER_PERCENTILES = [0.5, 0.95, 0.99, 0.999]
+JITTER_EXTENSIONS = 'halsim_ds_socket'
+
+# Known workloads. Any <name>.lua with a matching <name>.cpp is picked up,
+# this only adds a description.
+WORKLOADS = {
+    'plusone': 'IterativeRobotBase loopFunc, 2,000,000 iterations',
+    'fib': 'Recursive fib(40)',
+    'scheduler': 'CommandScheduler.run with 50 trigger bound commands, 100,000 iterations',
+    'pose2d': 'Pose2d construct, rotateBy and accessors through the FFI, 1,000,000 iterations',
+    'joystick': 'DriverStation polling of 6 axes, 10 buttons and a POV on 2 sticks, 200,000 iterations',
+}
+
+def time_command(cmd, env=None):
+    """Run a command once and return its wall time in seconds"""
+    start = time.perf_counter()
+    subprocess.run(
+        cmd,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=True
+    )
+    return time.perf_counter() - start
+
+def mad_filter(samples, k=OUTLIER_K):
+    """Split samples into (kept, outliers) using the median absolute deviation.
+
+    A sample is an outlier when it is more than k scaled MADs from the
+    median. 1.4826 scales the MAD to a standard deviation for normal data.
+    """
+    if len(samples) < 3:
+        return list(samples), []
+    med = statistics.median(samples)
+    mad = 1.4826 * statistics.median(abs(x - med) for x in samples)
+    if mad <= 0:
+        return list(samples), []
+    kept = [x for x in samples if abs(x - med) <= k * mad]
+    outliers = [x for x in samples if abs(x - med) > k * mad]
+    return kept, outliers
+
+def mean_ci(samples, confidence=CONFIDENCE):
+    """Normal approximation confidence interval for the mean"""
+    m = statistics.mean(samples)
+    if len(samples) < 2:
+        return m, m
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    half = z * statistics.stdev(samples) / math.sqrt(len(samples))
+    return m - half, m + half
+
+def percentile(sorted_values, q):
+    """Linear interpolated percentile of an already sorted list, q in [0, 1]"""
+    pos = q * (len(sorted_values) - 1)
+    lo = math.floor(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+def bootstrap_ratio_ci(a, b, confidence=CONFIDENCE, resamples=BOOTSTRAP_RESAMPLES, seed=0):
+    """Percentile bootstrap confidence interval for mean(a) / mean(b)"""
+    rng = random.Random(seed)
+    ratios = []
+    na, nb = len(a), len(b)
+    for _ in range(resamples):
+        ma = sum(a[rng.randrange(na)] for _ in range(na)) / na
+        mb = sum(b[rng.randrange(nb)] for _ in range(nb)) / nb
+        ratios.append(ma / mb)
+    ratios.sort()
+    alpha = (1 - confidence) / 2
+    return percentile(ratios, alpha), percentile(ratios, 1 - alpha)
+
+def pin_cpus(cpus):
+    """Pin this process, and so every benchmarked child, to the given CPUs"""
+    if not hasattr(os, 'sched_setaffinity'):
+        print("Warning: CPU pinning is not supported on this platform")
+        return
+    os.sched_setaffinity(0, cpus)
+    print(f"Pinned to CPU(s): {', '.join(str(c) for c in sorted(cpus))}")
+
+def summarize(times, args=None):
+    """Timing statistics over the samples left after outlier rejection"""
+    k = args.outlier_k if args is not None else OUTLIER_K
+    kept, outliers = mad_filter(times, k)
+    return {
+        'times': times,
+        'kept': kept,
+        'outliers': outliers,
+        'mean': statistics.mean(kept),
+        'median': statistics.median(kept),
+        'stdev': statistics.stdev(kept) if len(kept) > 1 else 0,
+        'min': min(kept),
+        'max': max(kept),
+        'ci': mean_ci(kept),
+    }
+
+def run_benchmark(cmd, env=None, args=None):
+    """Run a command repeatedly and return timing statistics.
+
+    Warmup runs are discarded. After min_runs, runs continue until the 95%
+    confidence interval of the mean is within ci_target of the mean, or
+    max_runs is reached.
+    """
+    warmup = args.warmup if args is not None else WARMUP
+    min_runs = args.runs if args is not None else RUNS
+    max_runs = max(args.max_runs if args is not None else MAX_RUNS, min_runs)
+    target = args.ci_target if args is not None else CI_TARGET
+
+    for i in range(warmup):
+        elapsed = time_command(cmd, env)
+        print(f"  Warmup {i+1:2d}: {elapsed:.4f}s")
 
-def run_benchmark(cmd, env=None, runs=RUNS):
-    """Run a command multiple times and return timing statistics"""
     times = []
+    while len(times) < max_runs:
+        elapsed = time_command(cmd, env)
+        times.append(elapsed)
+        print(f"  Run {len(times):2d}: {elapsed:.4f}s")
+        if len(times) >= min_runs:
+            stats = summarize(times, args)
+            lo, hi = stats['ci']
+            if (hi - lo) / 2 <= target * stats['mean']:
+                break
+
+    return summarize(times, args)
+
+def read_first_line(path):
+    try:
+        with open(path) as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+def command_output(cmd):
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True, check=True)
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def cpu_model():
+    """Human readable CPU model name"""
+    system = platform.system()
+    if system == 'Linux':
+        try:
+            with open('/proc/cpuinfo') as f:
+                for line in f:
+                    if line.startswith('model name') or line.startswith('Model'):
+                        return line.split(':', 1)[1].strip()
+        except OSError:
+            pass
+    elif system == 'Darwin':
+        model = command_output(['sysctl', '-n', 'machdep.cpu.brand_string'])
+        if model:
+            return model
+    return platform.processor() or platform.machine()
+
+def collect_environment(luabot, args):
+    """Describe the machine and build the benchmark ran on"""
+    cpus = sorted(args.cpu) if len(args.cpu) > 0 else [0]
+    version = command_output([str(luabot), '--version']) or ''
+    lines = version.splitlines()
+    sha = command_output(['git', '-C', str(SCRIPT_DIR), 'rev-parse', 'HEAD'])
+    dirty = command_output(['git', '-C', str(SCRIPT_DIR), 'status', '--porcelain', '--untracked-files=no'])
+    return {
+        'git_sha': sha,
+        'git_dirty': bool(dirty),
+        'luabot_version': lines[0].split(' -- ')[0] if len(lines) > 0 else None,
+        'luajit_version': lines[1].split(' -- ')[0] if len(lines) > 1 else None,
+        'cpu_model': cpu_model(),
+        'cpu_count': os.cpu_count(),
+        'governor': read_first_line(
+            f'/sys/devices/system/cpu/cpu{cpus[0]}/cpufreq/scaling_governor'),
+        'pinned_cpus': sorted(args.cpu),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+
+def workload_record(stats):
+    """JSON friendly subset of run_benchmark() statistics"""
+    return {
+        'mean': stats['mean'],
+        'median': stats['median'],
+        'stdev': stats['stdev'],
+        'min': stats['min'],
+        'max': stats['max'],
+        'ci': list(stats['ci']),
+        'runs': len(stats['times']),
+        'outliers': len(stats['outliers']),
+        'times': stats['times'],
+    }
+
+def parse_threshold(text):
+    """Parse '5%' or '0.05' into a fraction"""
+    text = text.strip()
+    if text.endswith('%'):
+        return float(text[:-1]) / 100
+    return float(text)
+
+def compare_results(results, baseline, threshold):
+    """Print a comparison against baseline and return regressed workloads.
+
+    A workload regresses when its mean is more than threshold slower than
+    the baseline mean and the two 95% confidence intervals don't overlap.
+    """
+    regressions = []
+    current = results.get('workloads', {})
+    previous = baseline.get('workloads', {})
+    print()
+    print("=" * 79)
+    print(f"Comparison against baseline {baseline.get('environment', {}).get('git_sha')}"
+          f" (threshold {threshold*100:.1f}%):")
+    print("=" * 79)
+    print(f"{'Workload':<30} {'Baseline':>11} {'Current':>11} {'Change':>9}  Status")
+    print("-" * 79)
+    for name, cur in current.items():
+        base = previous.get(name)
+        if base is None:
+            print(f"{name:<30} {'-':>11} {cur['mean']:>10.4f}s {'-':>9}  new")
+            continue
+        change = cur['mean'] / base['mean'] - 1
+        status = 'ok'
+        if change > threshold and cur['ci'][0] > base['ci'][1]:
+            status = 'REGRESSED'
+            regressions.append(name)
+        elif change < -threshold and cur['ci'][1] < base['ci'][0]:
+            status = 'improved'
+        print(f"{name:<30} {base['mean']:>10.4f}s {cur['mean']:>10.4f}s {change*100:>+8.1f}%  {status}")
+    print("=" * 79)
+    return regressions
+
+def finish(args, results):
+    """Write --json output and apply the --compare gate, returning an exit code"""
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        print(f"Wrote {args.json}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, parse_threshold(args.threshold))
+        if len(regressions) > 0:
+            print(f"Regressed: {', '.join(regressions)}")
+            return 1
+    return 0
+
+def lua_environment():
+    """Environment for running luabot against the build tree"""
+    lua_env = os.environ.copy()
+    lua_path = f"{BUILD_DIR}/lua/?.lua;{BUILD_DIR}/lua/?/init.lua;;"
+    lua_env['LUA_PATH'] = lua_path
+    return lua_env
+
+STARTUP_FIELDS = ['total', 'self', 'cdef', 'load', 'metatype']
+
+def run_startup(luabot, script, runs=RUNS, warmup=WARMUP):
+    """Run the startup shim and return per module median timings"""
+    cmd = [str(luabot), str(SCRIPT_DIR / "startup.lua"), str(script)]
+    for i in range(warmup):
+        elapsed = time_command(cmd, lua_environment())
+        print(f"  Warmup {i+1:2d}: {elapsed:.4f}s")
+
+    samples = {}
     for i in range(runs):
         start = time.perf_counter()
         result = subprocess.run(
             cmd,
-            env=env,
-            stdout=subprocess.DEVNULL,
+            env=lua_environment(),
+            stdout=subprocess.PIPE,
             stderr=subprocess.DEVNULL,
+            text=True,
             check=True
         )
-        end = time.perf_counter()
-        elapsed = end - start
-        times.append(elapsed)
+        elapsed = time.perf_counter() - start
         print(f"  Run {i+1:2d}: {elapsed:.4f}s")
-    
+
+        for line in result.stdout.splitlines():
+            cols = line.split('\t')
+            if len(cols) != 7 or cols[0] != 'startup':
+                continue
+            samples.setdefault(cols[1], []).append([float(c) for c in cols[2:]])
+        samples.setdefault('<process>', []).append([elapsed, 0, 0, 0, 0])
+
+    stats = {}
+    for name, rows in samples.items():
+        stats[name] = {
+            field: statistics.median(r[i] for r in rows)
+            for i, field in enumerate(STARTUP_FIELDS)
+        }
+    return stats
+
+def startup_main(args):
+    luabot = BUILD_DIR / "luabot"
+    if not luabot.exists():
+        print(f"Error: {luabot} not found")
+        return 1
+
+    print("=" * 79)
+    print(f"Startup benchmark: {args.script}")
+    print(f"Number of runs: {args.runs}")
+    print("=" * 79)
+    print()
+
+    stats = run_startup(luabot, args.script, args.runs, args.warmup)
+    process = stats.pop('<process>')
+    script = stats.pop('*', None)
+    modules = sorted(stats.items(), key=lambda kv: kv[1]['self'], reverse=True)
+
+    print()
+    print("=" * 79)
+    print("Median require time per module (ms), sorted by self time:")
+    print("=" * 79)
+    print(f"{'Module':<38} {'Total':>7} {'Self':>7} {'cdef':>7} {'load':>7} {'metatype':>8}")
+    print("-" * 79)
+    for name, st in modules:
+        print(f"{name:<38} {st['total']*1e3:>7.3f} {st['self']*1e3:>7.3f} "
+              f"{st['cdef']*1e3:>7.3f} {st['load']*1e3:>7.3f} {st['metatype']*1e3:>8.3f}")
+    print("-" * 79)
+    print(f"{'cdef total':<38} {sum(st['cdef'] for _, st in modules)*1e3:>15.3f}")
+    print(f"{'ffi.load total':<38} {sum(st['load'] for _, st in modules)*1e3:>15.3f}")
+    print(f"{'ffi.metatype total':<38} {sum(st['metatype'] for _, st in modules)*1e3:>15.3f}")
+    if script is not None:
+        print(f"{'Script':<38} {script['total']*1e3:>15.3f}")
+    print(f"{'Process wall time':<38} {process['total']*1e3:>15.3f}")
+    print("=" * 79)
+
+    return finish(args, {
+        'environment': collect_environment(luabot, args),
+        'workloads': {},
+        'startup': {
+            'process': process,
+            'script': script,
+            'modules': dict(modules),
+        },
+    })
+
+def read_jitter_log(path):
+    """Read (start, duration) pairs of native doubles written by a jitter robot"""
+    values = array.array('d')
+    with open(path, 'rb') as f:
+        values.frombytes(f.read())
+    return list(values[0::2]), list(values[1::2])
+
+def loop_summary(durations):
+    """run_benchmark() style statistics over every loop, none rejected.
+
+    The tail is what a jitter run measures, so there is no outlier filter.
+    """
     return {
-        'times': times,
-        'mean': statistics.mean(times),
-        'median': statistics.median(times),
-        'stdev': statistics.stdev(times) if len(times) > 1 else 0,
-        'min': min(times),
-        'max': max(times)
+        'times': durations,
+        'kept': durations,
+        'outliers': [],
+        'mean': statistics.mean(durations),
+        'median': statistics.median(durations),
+        'stdev': statistics.stdev(durations) if len(durations) > 1 else 0,
+        'min': min(durations),
+        'max': max(durations),
+        'ci': mean_ci(durations),
     }
 
-def main():
-    print("=" * 67)
-    print("Benchmark: plusone.lua vs plusone.cpp")
-    print("Iterations per run: 2,000,000")
-    print(f"Number of runs: {RUNS}")
-    print("=" * 67)
-    print()
-    
-    # Check executables exist
+def jitter_stats(starts, durations, period=JITTER_PERIOD):
+    """Loop time percentiles and start-to-start period statistics, in seconds"""
+    if len(durations) <= 0:
+        raise SystemExit("Jitter log is empty")
+    loop = sorted(durations)
+    gaps = sorted(b - a for a, b in zip(starts, starts[1:])) or [period]
+    stats = {
+        'loops': len(loop),
+        'period': period,
+        'period_overruns': sum(1 for d in loop if d > period),
+        'period_max': gaps[-1],
+        'late': sum(1 for g in gaps if g > JITTER_LATE_PERIODS * period),
+    }
+    for q in JITTER_PERCENTILES:
+        stats[f'p{q*100:g}'] = percentile(loop, q)
+        stats[f'period_p{q*100:g}'] = percentile(gaps, q)
+    return stats
+
+def run_jitter_robot(cmd, log, args, env=None):
+    """Run one jitter robot for --seconds, returns (loop_summary, jitter_stats)"""
+    env = dict(env or os.environ)
+    env['LUABOT_JITTER_SECONDS'] = str(args.seconds)
+    env['LUABOT_JITTER_LOG'] = str(log)
+    env['LUABOT_JITTER_PERIOD'] = str(JITTER_PERIOD)
+    env['HALSIM_EXTENSIONS'] = args.sim_extensions
+    if log.exists():
+        log.unlink()
+    subprocess.run(
+        cmd,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        timeout=args.seconds * 3 + 30,
+        check=True
+    )
+    starts, durations = read_jitter_log(log)
+    stats = jitter_stats(starts, durations)
+    return loop_summary(durations), stats
+
+def write_histogram(path, lua_durations, cpp_durations, bin_ms=JITTER_BIN_MS):
+    """Write loop time counts per bin_ms wide bucket as CSV"""
+    def counts(durations):
+        bins = {}
+        for d in durations:
+            b = int(d * 1e3 / bin_ms)
+            bins[b] = bins.get(b, 0) + 1
+        return bins
+    lua_bins = counts(lua_durations)
+    cpp_bins = counts(cpp_durations)
+    with open(path, 'w') as f:
+        f.write("bin_ms,lua,cpp\n")
+        for b in range(max(list(lua_bins) + list(cpp_bins)) + 1):
+            f.write(f"{b*bin_ms:.3f},{lua_bins.get(b, 0)},{cpp_bins.get(b, 0)}\n")
+    print(f"Wrote {path}")
+
+def jitter_main(args):
     luabot = BUILD_DIR / "luabot"
-    cpp_exe = BUILD_DIR / "test" / "plusone"
-    
     if not luabot.exists():
         print(f"Error: {luabot} not found")
         return 1
-    
+    cpp_exe = BUILD_DIR / "test" / "jitter"
     if not cpp_exe.exists():
         print(f"Building C++ version...")
-        subprocess.run(["ninja", "-C", str(BUILD_DIR), "test/plusone"], check=True)
+        subprocess.run(["ninja", "-C", str(BUILD_DIR), "test/jitter"], check=True)
         print()
-    
-    # Set up environment for Lua
-    lua_env = os.environ.copy()
-    lua_path = f"{BUILD_DIR}/lua/?.lua;{BUILD_DIR}/lua/?/init.lua;;"
-    lua_env['LUA_PATH'] = lua_path
-    
-    # Benchmark Lua
-    print("Benchmarking Lua version...")
-    lua_cmd = [str(luabot), str(SCRIPT_DIR / "plusone.lua")]
-    lua_stats = run_benchmark(lua_cmd, env=lua_env)
-    
+
+    print("=" * 67)
+    print(f"Jitter benchmark: TimedRobot loop, {JITTER_PERIOD*1e3:.0f} ms period")
+    print(f"Duration: {args.seconds}s per robot, HALSIM_EXTENSIONS={args.sim_extensions}")
+    print("=" * 67)
     print()
-    
-    # Benchmark C++
-    print("Benchmarking C++ version...")
-    cpp_cmd = [str(cpp_exe)]
-    cpp_stats = run_benchmark(cpp_cmd)
-    
-    # Print results
+
+    print("Running Lua robot...")
+    lua_cmd = [str(luabot), "sim", str(SCRIPT_DIR / "jitter" / "JitterRobot.lua")]
+    lua_loops, lua_stats = run_jitter_robot(
+        lua_cmd, BUILD_DIR / "test" / "jitter.lua.bin", args, lua_environment())
+    print("Running C++ robot...")
+    cpp_loops, cpp_stats = run_jitter_robot(
+        [str(cpp_exe)], BUILD_DIR / "test" / "jitter.cpp.bin", args)
+
+    print()
+    print("=" * 67)
+    print("Loop time (ms):")
+    print("=" * 67)
+    print(f"{'Metric':<15} {'Lua':>12} {'C++':>12} {'Ratio':>12}")
+    print("-" * 67)
+    rows = [('Mean', 'mean')] + [(f'p{q*100:g}', f'p{q*100:g}') for q in JITTER_PERCENTILES]
+    rows += [('Max', 'max'), ('Period p50', 'period_p50'),
+             ('Period p99.9', 'period_p99.9'), ('Period max', 'period_max')]
+    for label, key in rows:
+        lua = lua_stats[key] if key in lua_stats else lua_loops[key]
+        cpp = cpp_stats[key] if key in cpp_stats else cpp_loops[key]
+        ratio = f"{lua/cpp:>11.2f}x" if cpp > 0 else f"{'-':>12}"
+        print(f"{label:<15} {lua*1e3:>12.4f} {cpp*1e3:>12.4f} {ratio}")
+    print("-" * 67)
+    print(f"{'Loops':<15} {lua_stats['loops']:>12d} {cpp_stats['loops']:>12d}")
+    print(f"{'Period overruns':<15} {lua_stats['period_overruns']:>12d} {cpp_stats['period_overruns']:>12d}")
+    print(f"{'Late starts':<15} {lua_stats['late']:>12d} {cpp_stats['late']:>12d}")
+    print("=" * 67)
+    print(f"Period overruns are loops longer than the {JITTER_PERIOD*1e3:.0f} ms loop period, "
+          f"late starts")
+    print(f"are more than {JITTER_LATE_PERIODS*JITTER_PERIOD*1e3:.0f} ms after the previous loop started.")
+    print()
+
+    if args.histogram:
+        write_histogram(args.histogram, lua_loops['times'], cpp_loops['times'], args.bin_ms)
+
+    # Loop times share the timing workload schema, so --compare gates the
+    # mean loop time like any workload. Percentiles and overruns go apart.
+    lo, hi = bootstrap_ratio_ci(lua_loops['kept'], cpp_loops['kept'], resamples=JITTER_RESAMPLES)
+    return finish(args, {
+        'environment': collect_environment(luabot, args),
+        'workloads': {
+            'jitter.lua': workload_record(lua_loops),
+            'jitter.cpp': workload_record(cpp_loops),
+        },
+        'ratios': {
+            'jitter': {'ratio': lua_loops['mean'] / cpp_loops['mean'], 'ci': [lo, hi]},
+        },
+        'jitter': {
+            'jitter.lua': lua_stats,
+            'jitter.cpp': cpp_stats,
+        },
+    })
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='LuaBot benchmarks')
+    parser.add_argument('--runs', type=int, default=RUNS,
+                        help=f'Minimum number of runs (default: {RUNS})')
+    parser.add_argument('--max-runs', type=int, default=MAX_RUNS,
+                        help=f'Maximum number of runs (default: {MAX_RUNS})')
+    parser.add_argument('--warmup', type=int, default=WARMUP,
+                        help=f'Discarded warmup runs (default: {WARMUP})')
+    parser.add_argument('--ci-target', type=float, default=CI_TARGET,
+                        help='Stop once the 95%% CI half width is within this '
+                             f'fraction of the mean (default: {CI_TARGET})')
+    parser.add_argument('--outlier-k', type=float, default=OUTLIER_K,
+                        help=f'Reject samples this many MADs from the median (default: {OUTLIER_K})')
+    parser.add_argument('--cpu', type=int, action='append', default=[],
+                        help='Pin benchmarks to this CPU, may be repeated')
+    parser.add_argument('--list', action='store_true',
+                        help='List the available workloads and exit')
+    parser.add_argument('--only', action='append', default=[],
+                        help='Run only these workloads (comma separated, may be repeated)')
+    parser.add_argument('--json', metavar='FILE',
+                        help='Write machine readable results to FILE')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='Compare against a baseline written by --json')
+    parser.add_argument('--threshold', default='5%',
+                        help='Allowed slowdown for --compare, e.g. 5%% or 0.05 (default: 5%%)')
+    parser.add_argument('--startup', action='store_true',
+                        help='Time every require in a script, by module')
+    parser.add_argument('--script', default=str(SCRIPT_DIR / "requireall.lua"),
+                        help='Script to run with --startup (default: requireall.lua)')
+    parser.add_argument('--jitter', action='store_true',
+                        help='Measure TimedRobot loop timing under luabot sim')
+    parser.add_argument('--seconds', type=float, default=JITTER_SECONDS,
+                        help=f'How long to run each robot with --jitter (default: {JITTER_SECONDS})')
+    parser.add_argument('--histogram', metavar='FILE',
+                        help='Write the --jitter loop time histogram to FILE as CSV')
+    parser.add_argument('--bin-ms', type=float, default=JITTER_BIN_MS,
+                        help=f'Histogram bucket width in ms (default: {JITTER_BIN_MS})')
+    parser.add_argument('--sim-extensions', default=JITTER_EXTENSIONS,
+                        help=f'HALSIM_EXTENSIONS for --jitter (default: {JITTER_EXTENSIONS})')
+    return parser.parse_args()
+
+def discover_workloads():
+    """Find paired workloads: <name>.lua next to <name>.cpp in this directory.
+
+    The C++ side is built as the test/<name> target. Descriptions come from
+    the WORKLOADS registry when the workload is listed there.
+    """
+    found = {}
+    for lua in sorted(SCRIPT_DIR.glob("*.lua")):
+        if (SCRIPT_DIR / f"{lua.stem}.cpp").exists():
+            found[lua.stem] = WORKLOADS.get(lua.stem, '')
+    return found
+
+def select_workloads(args):
+    available = discover_workloads()
+    if len(args.only) <= 0:
+        return list(available)
+    names = [n.strip() for o in args.only for n in o.split(',') if len(n.strip()) > 0]
+    unknown = [n for n in names if n not in available]
+    if len(unknown) > 0:
+        raise SystemExit(f"Unknown workload(s): {', '.join(unknown)}. "
+                         f"Available: {', '.join(available)}")
+    return names
+
+def print_comparison(lua_stats, cpp_stats):
+    """Print the Lua vs C++ table for one workload and return the ratio and CI"""
     print()
     print("=" * 67)
     print("Results:")
@@ -93,18 +621,97 @@ def main():
     print(f"{'Min':<15} {lua_stats['min']:>11.4f}s {cpp_stats['min']:>11.4f}s {lua_stats['min']/cpp_stats['min']:>11.2f}x")
     print(f"{'Max':<15} {lua_stats['max']:>11.4f}s {cpp_stats['max']:>11.4f}s {lua_stats['max']/cpp_stats['max']:>11.2f}x")
     print(f"{'Std Dev':<15} {lua_stats['stdev']:>11.4f}s {cpp_stats['stdev']:>11.4f}s")
+    print(f"{'Runs kept':<15} {len(lua_stats['kept']):>12d} {len(cpp_stats['kept']):>12d}")
+    print(f"{'Outliers':<15} {len(lua_stats['outliers']):>12d} {len(cpp_stats['outliers']):>12d}")
+    print(f"{'Mean 95% CI':<15} {lua_stats['ci'][0]:>11.4f}s {cpp_stats['ci'][0]:>11.4f}s")
+    print(f"{'':<15} {lua_stats['ci'][1]:>11.4f}s {cpp_stats['ci'][1]:>11.4f}s")
     print("=" * 67)
-    
+
     ratio = lua_stats['mean'] / cpp_stats['mean']
-    if ratio < 1:
-        print(f"Lua is {1/ratio:.2f}x faster than C++")
-    elif ratio > 1:
-        print(f"C++ is {ratio:.2f}x faster than Lua")
+    lo, hi = bootstrap_ratio_ci(lua_stats['kept'], cpp_stats['kept'])
+    print(f"Lua/C++ mean ratio: {ratio:.3f}x (95% CI {lo:.3f}x - {hi:.3f}x)")
+    if hi < 1:
+        print(f"Lua is {1/hi:.2f}x-{1/lo:.2f}x faster than C++")
+    elif lo > 1:
+        print(f"C++ is {lo:.2f}x-{hi:.2f}x faster than Lua")
     else:
-        print("Performance is roughly equal")
+        print("No significant difference at 95% confidence")
     print("=" * 67)
-    
-    return 0
+    return ratio, lo, hi
+
+def run_workload(name, luabot, args):
+    """Benchmark <name>.lua against the test/<name> executable"""
+    cpp_exe = BUILD_DIR / "test" / name
+
+    print("=" * 67)
+    print(f"Benchmark: {name}.lua vs {name}.cpp")
+    if WORKLOADS.get(name):
+        print(WORKLOADS[name])
+    print(f"Runs: {args.runs}-{args.max_runs} after {args.warmup} warmup")
+    print("=" * 67)
+    print()
+
+    if not cpp_exe.exists():
+        print(f"Building C++ version...")
+        subprocess.run(["ninja", "-C", str(BUILD_DIR), f"test/{name}"], check=True)
+        print()
+
+    # Benchmark Lua
+    print("Benchmarking Lua version...")
+    lua_cmd = [str(luabot), str(SCRIPT_DIR / f"{name}.lua")]
+    lua_stats = run_benchmark(lua_cmd, env=lua_environment(), args=args)
+
+    print()
+
+    # Benchmark C++
+    print("Benchmarking C++ version...")
+    cpp_cmd = [str(cpp_exe)]
+    cpp_stats = run_benchmark(cpp_cmd, args=args)
+
+    ratio, lo, hi = print_comparison(lua_stats, cpp_stats)
+    print()
+    return lua_stats, cpp_stats, ratio, lo, hi
+
+def main():
+    args = parse_args()
+    if args.list:
+        for name, description in discover_workloads().items():
+            print(f"{name:<12} {description}")
+        return 0
+
+    if len(args.cpu) > 0:
+        pin_cpus(set(args.cpu))
+    if args.startup:
+        return startup_main(args)
+    if args.jitter:
+        return jitter_main(args)
+
+    luabot = BUILD_DIR / "luabot"
+    if not luabot.exists():
+        print(f"Error: {luabot} not found")
+        return 1
+
+    results = {
+        'environment': collect_environment(luabot, args),
+        'workloads': {},
+        'ratios': {},
+    }
+
+    for name in select_workloads(args):
+        lua_stats, cpp_stats, ratio, lo, hi = run_workload(name, luabot, args)
+        results['workloads'][f'{name}.lua'] = workload_record(lua_stats)
+        results['workloads'][f'{name}.cpp'] = workload_record(cpp_stats)
+        results['ratios'][name] = {'ratio': ratio, 'ci': [lo, hi]}
+
+    if len(results['ratios']) > 1:
+        print("=" * 67)
+        print("Summary (Lua/C++ mean ratio, 95% CI):")
+        print("=" * 67)
+        for name, r in results['ratios'].items():
+            print(f"{name:<15} {r['ratio']:>8.3f}x   [{r['ci'][0]:.3f}x - {r['ci'][1]:.3f}x]")
+        print("=" * 67)
+
+    return finish(args, results)
 
 if __name__ == "__main__":
     exit(main())
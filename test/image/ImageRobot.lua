@@ -0,0 +1,64 @@
+---SPDX-FileCopyrightText: Michael Fisher @mfisher31
+---SPDX-License-Identifier: MIT
+
+-- Packed by vendordep/robotimage.py and run with `luabot sim`, see
+-- test/CMakeLists.txt. Checks the image index and that require is served
+-- from it, then fails on purpose with a message the test matches.
+
+-- Byte order, which robotimage.py sorts by and luabot_image_searcher
+-- binary searches: upper case first, and a name before its extensions
+local names = { 'image.mods.B', 'image.mods.a', 'image.mods.a.b', 'image.mods.ab' }
+
+local function u32(data, i)
+    local a, b, c, d = data:byte(i, i + 3)
+    return a + b * 0x100 + c * 0x10000 + d * 0x1000000
+end
+
+local function check(ok, message)
+    if not ok then error('ImageRobot: ' .. message, 2) end
+end
+
+local f = assert(io.open(assert(os.getenv('LUABOT_TEST_IMAGE')), 'rb'))
+local data = f:read('*a')
+f:close()
+
+check(data:sub(1, 8) == 'LUABOTIM', 'bad magic')
+check(u32(data, 9) == 1, 'bad version')
+local count = u32(data, 13)
+check(count == #names + 1, 'expected ' .. (#names + 1) .. ' entries, got ' .. count)
+
+local index = {}
+for i = 0, count - 1 do
+    local e = 17 + i * 16
+    local offset, length = u32(data, e), u32(data, e + 4)
+    local chunk, size = u32(data, e + 8), u32(data, e + 12)
+    check(chunk + size <= #data, 'entry ' .. i .. ' chunk out of range')
+    index[#index + 1] = data:sub(offset + 1, offset + length)
+end
+
+check(index[1] == 'ImageRobot', 'entry 0 should be the robot, got ' .. index[1])
+for i, name in ipairs(names) do
+    check(index[i + 1] == name, 'entry ' .. i .. ' should be ' .. name .. ', got ' .. index[i + 1])
+end
+
+-- Chunks loaded from the image are named after their module
+check(debug.getinfo(1, 'S').source == '@ImageRobot', 'robot not loaded from the image')
+local modules = {
+    ['image.mods.B'] = require('image.mods.B'),
+    ['image.mods.a'] = require('image.mods.a'),
+    ['image.mods.a.b'] = require('image.mods.a.b'),
+    ['image.mods.ab'] = require('image.mods.ab'),
+}
+for _, name in ipairs(names) do
+    check(modules[name].source == '@' .. name, name .. ' loaded from ' .. modules[name].source)
+end
+
+local ok, err = pcall(require, 'image.mods.missing')
+check(not ok and err:find("no module 'image.mods.missing' in robot image", 1, true) ~= nil,
+      'missing module not reported by the image searcher')
+
+return {
+    new = function()
+        error('ImageRobot: image checks passed')
+    end
+}
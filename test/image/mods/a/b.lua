@@ -0,0 +1,4 @@
+---SPDX-FileCopyrightText: Michael Fisher @mfisher31
+---SPDX-License-Identifier: MIT
+
+return { source = debug.getinfo(1, 'S').source }
@@ -0,0 +1,80 @@
+---SPDX-FileCopyrightText: Michael Fisher @mfisher31
+---SPDX-License-Identifier: MIT
+
+--- Loop timing robot used by `benchmark.py --jitter`.
+---
+--- Wraps loopFunc to log every iteration as a (start, duration) pair of
+--- native doubles, in seconds of FPGA time, to LUABOT_JITTER_LOG. Stops
+--- the robot after LUABOT_JITTER_SECONDS, looping every LUABOT_JITTER_PERIOD. The log is preallocated so the
+--- hook itself creates no garbage. Each loop polls two Xbox controllers,
+--- as a typical teleop robot would. See jitter.cpp for the C++ equivalent.
+
+local ffi = require('ffi')
+local class = require('luabot.class')
+local TimedRobot = require('wpi.frc.TimedRobot')
+local Timer = require('wpi.frc.Timer')
+local XboxController = require('wpi.frc.XboxController')
+
+local seconds = tonumber(os.getenv('LUABOT_JITTER_SECONDS')) or 10
+local logPath = os.getenv('LUABOT_JITTER_LOG') or 'jitter.lua.bin'
+-- Loop period in seconds, set by benchmark.py so both robots match
+local period = tonumber(os.getenv('LUABOT_JITTER_PERIOD')) or 0.02
+
+---@class JitterRobot : TimedRobot
+local JitterRobot = class(TimedRobot)
+
+local function writeLog(log, count)
+    local f = assert(io.open(logPath, 'wb'))
+    f:write(ffi.string(log, ffi.sizeof('double') * 2 * count))
+    f:close()
+end
+
+function JitterRobot:robotInit()
+    self.pads = { XboxController.new(0), XboxController.new(1) }
+    self.sum = 0
+end
+
+function JitterRobot:robotPeriodic()
+    local sum = 0
+    for _, pad in ipairs(self.pads) do
+        sum = sum + pad:getLeftX() + pad:getLeftY() + pad:getRightX() + pad:getRightY()
+            + pad:getLeftTriggerAxis() + pad:getRightTriggerAxis() + pad:getPOV()
+        for button = 1, 10 do
+            if pad:getRawButton(button) then sum = sum + 1 end
+        end
+    end
+    self.sum = sum
+end
+
+---Create a new JitterRobot instance
+---@return JitterRobot
+function JitterRobot.new()
+    local self = setmetatable({}, JitterRobot)
+    TimedRobot.init(self, period)
+
+    local capacity = math.ceil(seconds / period) + 64
+    local log = ffi.new('double[?]', capacity * 2)
+    local count = 0
+    local first = nil
+    local loopFunc = self.loopFunc
+
+    function self:loopFunc()
+        local t0 = Timer.getFPGATimestamp()
+        loopFunc(self)
+        local t1 = Timer.getFPGATimestamp()
+
+        first = first or t0
+        log[count * 2] = t0
+        log[count * 2 + 1] = t1 - t0
+        count = count + 1
+
+        if t1 - first >= seconds or count >= capacity then
+            writeLog(log, count)
+            self:endCompetition()
+        end
+    end
+
+    return self
+end
+
+return JitterRobot
@@ -0,0 +1,120 @@
+// SPDX-FileCopyrightText: Michael Fisher @mfisher31
+// SPDX-License-Identifier: MIT
+
+// C++ equivalent of JitterRobot.lua for `benchmark.py --jitter`. Runs the
+// same notifier loop as TimedRobot and logs every LoopFunc as a (start,
+// duration) pair of native doubles to LUABOT_JITTER_LOG, polling two Xbox
+// controllers every loop.
+
+#include <cmath>
+#include <cstdio>
+#include <cstdlib>
+#include <vector>
+
+#include <frc/IterativeRobotBase.h>
+#include <frc/RobotBase.h>
+#include <frc/Timer.h>
+#include <frc/XboxController.h>
+#include <hal/DriverStation.h>
+#include <hal/Notifier.h>
+
+static double env_number (const char* name, double fallback) {
+    auto value = std::getenv (name);
+    return value != nullptr ? std::atof (value) : fallback;
+}
+
+// Loop period in seconds, set by benchmark.py so both robots match
+static const double period = env_number ("LUABOT_JITTER_PERIOD", 0.02);
+
+class JitterRobot : public frc::IterativeRobotBase {
+public:
+    JitterRobot() : frc::IterativeRobotBase (units::second_t (period)) {
+        seconds = env_number ("LUABOT_JITTER_SECONDS", 10);
+        auto path = std::getenv ("LUABOT_JITTER_LOG");
+        log_path  = path != nullptr ? path : "jitter.cpp.bin";
+        log.reserve (2 * (static_cast<size_t> (std::ceil (seconds / period)) + 64));
+
+        int32_t status = 0;
+        notifier       = HAL_InitializeNotifier (&status);
+        HAL_SetNotifierName (notifier, "JitterRobot", &status);
+    }
+
+    ~JitterRobot() override {
+        int32_t status = 0;
+        HAL_StopNotifier (notifier, &status);
+        HAL_CleanNotifier (notifier);
+    }
+
+    void RobotPeriodic() override {
+        double total = 0;
+        for (auto& pad : pads) {
+            total += pad.GetLeftX() + pad.GetLeftY() + pad.GetRightX() + pad.GetRightY()
+                   + pad.GetLeftTriggerAxis() + pad.GetRightTriggerAxis() + pad.GetPOV();
+            for (int button = 1; button <= 10; ++button)
+                if (pad.GetRawButton (button))
+                    total += 1;
+        }
+        sum = total;
+    }
+
+    void StartCompetition() override {
+        RobotInit();
+        if (IsSimulation())
+            SimulationInit();
+        HAL_ObserveUserProgramStarting();
+
+        int32_t status      = 0;
+        uint64_t expiration = HAL_GetFPGATime (&status);
+        while (true) {
+            expiration += static_cast<uint64_t> (period * 1e6);
+            HAL_UpdateNotifierAlarm (notifier, expiration, &status);
+            if (status != 0)
+                break;
+            auto now = HAL_WaitForNotifierAlarm (notifier, &status);
+            if (now == 0 || status != 0)
+                break;
+            TimedLoopFunc();
+        }
+    }
+
+    void EndCompetition() override {
+        int32_t status = 0;
+        HAL_StopNotifier (notifier, &status);
+    }
+
+private:
+    HAL_NotifierHandle notifier;
+    frc::XboxController pads[2] { frc::XboxController (0), frc::XboxController (1) };
+    double sum { 0 };
+    double seconds { 10 };
+    double first { -1 };
+    const char* log_path { nullptr };
+    std::vector<double> log;
+
+    void TimedLoopFunc() {
+        double t0 = frc::Timer::GetFPGATimestamp().value();
+        LoopFunc();
+        double t1 = frc::Timer::GetFPGATimestamp().value();
+
+        if (first < 0)
+            first = t0;
+        log.push_back (t0);
+        log.push_back (t1 - t0);
+
+        if (t1 - first >= seconds || log.size() >= log.capacity()) {
+            WriteLog();
+            EndCompetition();
+        }
+    }
+
+    void WriteLog() {
+        if (auto f = std::fopen (log_path, "wb")) {
+            std::fwrite (log.data(), sizeof (double), log.size(), f);
+            std::fclose (f);
+        }
+    }
+};
+
+int main() {
+    return frc::StartRobot<JitterRobot>();
+}
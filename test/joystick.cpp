@@ -0,0 +1,39 @@
+// SPDX-FileCopyrightText: Michael Fisher @mfisher31
+// SPDX-License-Identifier: MIT
+
+#include <cstdio>
+
+#include <frc/DriverStation.h>
+#include <frc/RobotBase.h>
+
+static const int iterations = 200000;
+static const int sticks     = 2;
+static const int axes       = 6;
+static const int buttons    = 10;
+
+// No Driver Station is attached: axes read 0, buttons false and POVs -1,
+// so only the POV reads add to the sum.
+static const double expected = iterations * sticks * -1.0;
+
+int main() {
+    frc::RunHALInitialization();
+    volatile double sum = 0;
+
+    for (int i = 0; i < iterations; ++i) {
+        frc::DriverStation::RefreshData();
+        for (int stick = 0; stick < sticks; ++stick) {
+            for (int axis = 0; axis < axes; ++axis)
+                sum = sum + frc::DriverStation::GetStickAxis (stick, axis);
+            for (int button = 1; button <= buttons; ++button)
+                if (frc::DriverStation::GetStickButton (stick, button))
+                    sum = sum + 1;
+            sum = sum + frc::DriverStation::GetStickPOV (stick, 0);
+        }
+    }
+
+    if (sum != expected) {
+        std::printf ("joystick: sum %g, expected %g\n", (double) sum, expected);
+        return 1;
+    }
+    return 0;
+}
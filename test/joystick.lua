@@ -0,0 +1,43 @@
+---SPDX-FileCopyrightText: Michael Fisher @mfisher31
+---SPDX-License-Identifier: MIT
+
+local iterations = 200000
+local sticks = 2
+local axes = 6
+local buttons = 10
+
+-- No Driver Station is attached: axes read 0, buttons false and POVs -1,
+-- so only the POV reads add to the sum.
+local expected = iterations * sticks * -1
+
+local hal = require('wpi.hal')
+local DriverStation = require('wpi.frc.DriverStation')
+
+local function main()
+    hal.initialize(500, 0)
+    local sum = 0
+
+    for _ = 1, iterations do
+        DriverStation.refreshData()
+        for stick = 0, sticks - 1 do
+            for axis = 0, axes - 1 do
+                sum = sum + DriverStation.getStickAxis(stick, axis)
+            end
+            for button = 1, buttons do
+                if DriverStation.getStickButton(stick, button) then
+                    sum = sum + 1
+                end
+            end
+            sum = sum + DriverStation.getStickPOV(stick, 0)
+        end
+    end
+
+    hal.shutdown()
+    if sum ~= expected then
+        print(string.format('joystick: sum %g, expected %g', sum, expected))
+        return 1
+    end
+    return 0
+end
+
+os.exit(main())
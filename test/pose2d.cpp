@@ -0,0 +1,21 @@
+// SPDX-FileCopyrightText: Michael Fisher @mfisher31
+// SPDX-License-Identifier: MIT
+
+#include <frc/geometry/Pose2d.h>
+
+static const int iterations = 1000000;
+
+int main() {
+    const frc::Rotation2d step { units::radian_t (0.001) };
+    volatile double sum = 0.0;
+
+    for (int i = 1; i <= iterations; ++i) {
+        frc::Pose2d pose { units::meter_t (i * 0.001),
+                           units::meter_t (2.0),
+                           frc::Rotation2d { units::radian_t (0.5) } };
+        auto rotated = pose.RotateBy (step);
+        sum          = sum + rotated.X().value() + rotated.Y().value() + rotated.Rotation().Radians().value();
+    }
+
+    return sum != 0 ? 0 : 1;
+}
@@ -0,0 +1,23 @@
+---SPDX-FileCopyrightText: Michael Fisher @mfisher31
+---SPDX-License-Identifier: MIT
+
+local iterations = 1000000
+
+local ffi = require('ffi')
+local Pose2d = require('wpi.math.geometry.Pose2d')
+local Rotation2d = require('wpi.math.geometry.Rotation2d')
+
+local function main()
+    local step = Rotation2d(0.001)
+    local sum = 0.0
+
+    for i = 1, iterations do
+        local pose = Pose2d(i * 0.001, 2.0, 0.5)
+        local rotated = ffi.gc(pose:rotateBy(step), ffi.C.frcPose2dFree)
+        sum = sum + rotated:x() + rotated:y() + rotated:rotation():radians()
+    end
+
+    return sum ~= 0 and 0 or 1
+end
+
+os.exit(main())
@@ -0,0 +1,30 @@
+// SPDX-FileCopyrightText: Michael Fisher @mfisher31
+// SPDX-License-Identifier: MIT
+
+#include <frc/RobotBase.h>
+#include <frc2/command/CommandScheduler.h>
+#include <frc2/command/Commands.h>
+#include <frc2/command/button/Trigger.h>
+
+static const int iterations = 100000;
+static const int commands   = 50;
+
+int main() {
+    frc::RunHALInitialization();
+    auto& scheduler = frc2::CommandScheduler::GetInstance();
+    int tick        = 0;
+    long counter    = 0;
+
+    // Trigger i flips every i loops and runs its command while true.
+    for (int i = 1; i <= commands; ++i) {
+        frc2::Trigger ([&tick, i] { return (tick / i) % 2 == 0; })
+            .WhileTrue (frc2::cmd::Run ([&counter] { ++counter; }).IgnoringDisable (true));
+    }
+
+    for (int i = 1; i <= iterations; ++i) {
+        tick = i;
+        scheduler.Run();
+    }
+
+    return counter > 0 ? 0 : 1;
+}
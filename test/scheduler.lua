@@ -0,0 +1,35 @@
+---SPDX-FileCopyrightText: Michael Fisher @mfisher31
+---SPDX-License-Identifier: MIT
+
+local iterations = 100000
+local commands = 50
+
+local hal = require('wpi.hal')
+local CommandScheduler = require('wpi.cmd.CommandScheduler')
+local RunCommand = require('wpi.cmd.RunCommand')
+local Trigger = require('wpi.cmd.button.Trigger')
+
+local function main()
+    hal.initialize(500, 0)
+    local scheduler = CommandScheduler.getInstance()
+    local tick = 0
+    local counter = 0
+
+    -- Trigger i flips every i loops and runs its command while true.
+    for i = 1, commands do
+        local command = RunCommand.new(function() counter = counter + 1 end)
+        Trigger.new(function()
+            return math.floor(tick / i) % 2 == 0
+        end):whileTrue(command)
+    end
+
+    for i = 1, iterations do
+        tick = i
+        scheduler:run()
+    end
+
+    hal.shutdown()
+    return counter > 0 and 0 or 1
+end
+
+os.exit(main())
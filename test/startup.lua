@@ -0,0 +1,100 @@
+---SPDX-FileCopyrightText: Michael Fisher @mfisher31
+---SPDX-License-Identifier: MIT
+
+--- Startup instrumentation shim used by `benchmark.py --startup`.
+---
+--- Wraps `require`, `ffi.cdef`, `ffi.load` and `ffi.metatype` with a wall
+--- clock, runs a script (requireall.lua by default) and prints one line per
+--- module loaded:
+---
+---   startup <module> <total> <self> <cdef> <load> <metatype>
+---
+--- Times are in seconds. `total` includes nested requires, `self` does not.
+
+local ffi = require('ffi')
+
+local now
+if ffi.os == 'Windows' then
+    ffi.cdef [[
+    int QueryPerformanceCounter(int64_t* count);
+    int QueryPerformanceFrequency(int64_t* freq);
+    ]]
+    local kernel32 = ffi.load('kernel32')
+    local counter = ffi.new('int64_t[1]')
+    kernel32.QueryPerformanceFrequency(counter)
+    local freq = tonumber(counter[0])
+    now = function()
+        kernel32.QueryPerformanceCounter(counter)
+        return tonumber(counter[0]) / freq
+    end
+else
+    ffi.cdef [[
+    typedef struct { long tv_sec; long tv_nsec; } luabot_startup_timespec;
+    int clock_gettime(int clock, luabot_startup_timespec* ts);
+    ]]
+    local CLOCK_MONOTONIC = ffi.os == 'OSX' and 6 or 1
+    local ts = ffi.new('luabot_startup_timespec')
+    now = function()
+        ffi.C.clock_gettime(CLOCK_MONOTONIC, ts)
+        return tonumber(ts.tv_sec) + tonumber(ts.tv_nsec) * 1e-9
+    end
+end
+
+local records = {}
+local stack = {}
+
+local function timed(category, fn)
+    return function(...)
+        local frame = stack[#stack]
+        if frame == nil then
+            return fn(...)
+        end
+        local t0 = now()
+        local r1, r2 = fn(...)
+        frame[category] = frame[category] + (now() - t0)
+        return r1, r2
+    end
+end
+
+ffi.cdef = timed('cdef', ffi.cdef)
+ffi.load = timed('load', ffi.load)
+ffi.metatype = timed('metatype', ffi.metatype)
+
+local baseRequire = require
+function require(name)
+    if package.loaded[name] ~= nil then
+        return baseRequire(name)
+    end
+
+    local frame = { name = name, children = 0, cdef = 0, load = 0, metatype = 0 }
+    stack[#stack + 1] = frame
+    local t0 = now()
+    local mod = baseRequire(name)
+    local total = now() - t0
+    stack[#stack] = nil
+
+    frame.total = total
+    frame.self = total - frame.children
+    local parent = stack[#stack]
+    if parent ~= nil then
+        parent.children = parent.children + total
+    end
+    records[#records + 1] = frame
+    return mod
+end
+
+local script = arg and arg[1]
+if script == nil then
+    local dir = (arg and arg[0] or ''):match('^(.*[/\\])') or ''
+    script = dir .. 'requireall.lua'
+end
+
+local t0 = now()
+dofile(script)
+local elapsed = now() - t0
+
+for _, r in ipairs(records) do
+    print(string.format('startup\t%s\t%.9f\t%.9f\t%.9f\t%.9f\t%.9f',
+        r.name, r.total, r.self, r.cdef, r.load, r.metatype))
+end
+print(string.format('startup\t*\t%.9f\t0\t0\t0\t0', elapsed))
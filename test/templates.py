@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: Michael Fisher @mfisher31
+# SPDX-License-Identifier: MIT
+
+"""
+Check that util/parse.py renders a binding through its namespace's
+template overrides, and through TEMPLATES everywhere else
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname (os.path.dirname (os.path.abspath (__file__)))
+sys.path.insert (0, os.path.join (ROOT, 'util'))
+
+import parse
+
+BINDINGS = os.path.join (ROOT, 'bindings')
+TIMER = os.path.join (BINDINGS, 'wpi', 'frc', 'Timer.yaml')
+
+def render (fmt):
+    obj = parse.open_class_def (TIMER)
+    return parse.GENERATORS[fmt] (obj)
+
+def main():
+    parse.load_type_registry (BINDINGS, [])
+    lua, stub = render ('lua'), render ('stubs')
+
+    # Another namespace's override leaves frc alone
+    parse.NAMESPACE_TEMPLATES = parse.compile_namespace_templates ({
+        'nt': { 'lua_method': '-- nt @NAME@\n' }
+    })
+    assert render ('lua') == lua, 'nt override changed an frc binding'
+
+    parse.NAMESPACE_TEMPLATES = parse.compile_namespace_templates ({
+        'frc': {
+            'lua_method': '-- frc @NAME@\n',
+            'lua_stub':   '-- stub @TYPENAME@\n'
+        }
+    })
+    overridden = render ('lua')
+    assert '-- frc getFPGATimestamp\n' in overridden, 'frc lua_method override not used'
+    assert 'function Timer.getFPGATimestamp(' not in overridden, 'default lua_method still used'
+    assert overridden.startswith (lua[:lua.index ('local Timer = {}')]), \
+        'lua_class should still come from TEMPLATES'
+    assert render ('stubs') == '-- stub Timer\n', 'frc lua_stub override not used'
+
+    try:
+        parse.compile_namespace_templates ({ 'frc': { 'lua_klass': '' } })
+    except Exception as e:
+        assert 'lua_klass' in str (e), e
+    else:
+        assert False, 'unknown template name accepted'
+
+    parse.NAMESPACE_TEMPLATES = parse.compile_namespace_templates ({})
+    assert render ('lua') == lua and render ('stubs') == stub, \
+        'rendering without overrides should match TEMPLATES'
+
+    print ('templates: All tests passed')
+    return 0
+
+if __name__ == '__main__':
+    exit (main())
@@ -8,3 +8,23 @@ do
     led1:start()
     led1:stop()
 end
+
+collectgarbage()
+
+do
+    local led2 = AddressableLED.new(2)
+    led2:start()
+    led2:release()
+end
+
+do
+    local led3 = AddressableLED.new(3)
+    local data = AddressableLED.LEDData(60)
+    for i = 0, 59 do
+        data[i].r, data[i].g, data[i].b = i, 255 - i, 0
+    end
+    led3:setLength(60)
+    led3:setData(data)
+    led3:setData(data, 30)
+    led3:release()
+end
@@ -211,6 +211,42 @@ end
 
 collectgarbage()
 
+-- Test reads from the per-loop joystick snapshot
+do
+    local DriverStation = require('wpi.frc.DriverStation')
+    DriverStation.refreshData()
+    GenericHID.refreshSnapshots()
+
+    local hid = GenericHID.new(0)
+    lu.assertEquals(hid:getRawAxis(0), 0.0, 'snapshot axis should be 0.0 when no joystick')
+    lu.assertFalse(hid:getRawButton(1), 'snapshot button should be false when no joystick')
+    lu.assertEquals(hid:getPOV(), -1, 'snapshot POV should be -1 when no joystick')
+    lu.assertEquals(hid:getAxisCount(), DriverStation.getStickAxisCount(0))
+    lu.assertEquals(hid:getButtonCount(), DriverStation.getStickButtonCount(0))
+    lu.assertEquals(hid:getPOVCount(), DriverStation.getStickPOVCount(0))
+
+    -- Out of range reads go to the DriverStation, which reports them missing
+    lu.assertFalse(hid:getRawButton(32), 'missing button should be false')
+    lu.assertEquals(hid:getRawAxis(12), 0.0, 'missing axis should be 0.0')
+    lu.assertEquals(hid:getPOV(12), -1, 'missing POV should be -1')
+
+    -- A refresh without refreshSnapshots() leaves the snapshots stale
+    local count = DriverStation.refreshCount
+    DriverStation.refreshData()
+    lu.assertEquals(DriverStation.refreshCount, count + 1, 'refreshData should bump refreshCount')
+    lu.assertEquals(hid:getRawAxis(0), 0.0, 'stale snapshot should read through the DriverStation')
+    lu.assertEquals(hid:getAxisCount(), DriverStation.getStickAxisCount(0))
+
+    local ports = DriverStation.getJoystickPorts()
+    lu.assertEquals(ports, 6, 'kJoystickPorts should be 6')
+    local snapshots = DriverStation.StickSnapshot(ports)
+    lu.assertEquals(DriverStation.getStickSnapshots(snapshots), ports)
+    lu.assertTrue(DriverStation.getStickSnapshot(ports - 1, snapshots))
+    lu.assertFalse(DriverStation.getStickSnapshot(ports, snapshots))
+end
+
+collectgarbage()
+
 -- Cleanup HAL
 hal.shutdown()
 
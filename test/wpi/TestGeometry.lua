@@ -5,7 +5,11 @@ local lu = require('luaunit')
 
 local CoordinateAxis = require ('wpi.math.geometry.CoordinateAxis')
 local Pose2d = require('wpi.math.geometry.Pose2d')
+local Pose3d = require('wpi.math.geometry.Pose3d')
+local Quaternion = require('wpi.math.geometry.Quaternion')
 local Rotation2d = require ('wpi.math.geometry.Rotation2d')
+local Rotation3d = require ('wpi.math.geometry.Rotation3d')
+local Translation3d = require ('wpi.math.geometry.Translation3d')
 
 -- FIXME: type dependency loading is not handled yet.
 require('wpi.math.geometry.Rotation2d')
@@ -57,3 +61,40 @@ do
     assert (CoordinateAxis.U() ~= nil)
     assert (CoordinateAxis.D() ~= nil)
 end
+
+collectgarbage()
+
+do -- value types
+    local q = Quaternion.new(1, 0, 0, 0)
+    lu.assertEquals(q.m_r, 1)
+    lu.assertEquals(q:w(), 1)
+    lu.assertEquals(q:norm(), 1)
+    local c = Quaternion.new(0, 1, 0, 0):conjugate()
+    lu.assertEquals(c:x(), -1)
+    lu.assertEquals(c.m_v[0], -1)
+
+    local p1, p2 = Pose3d.new(), Pose3d.new()
+    lu.assertEquals(p1.m_rotation[0], 1, "identity rotation")
+    local rel = p1:relativeTo(p2)
+    lu.assertEquals(rel:x() + rel:y() + rel:z(), 0)
+end
+
+collectgarbage()
+
+do -- types from other bindings
+    local t = Translation3d.new(3, 4, 0)
+    lu.assertEquals(t:norm(), 5)
+    lu.assertEquals(t:distance(Translation3d.new(3, 4, 0)), 0)
+
+    local yaw = Rotation3d.new(0, 0, math.pi / 2)
+    lu.assertAlmostEquals(yaw:z(), math.pi / 2, 1e-9)
+    lu.assertAlmostEquals(yaw:getQuaternion():norm(), 1, 1e-9)
+
+    local r = t:rotateBy(yaw)
+    lu.assertAlmostEquals(r:x(), -4, 1e-9)
+    lu.assertAlmostEquals(r:y(), 3, 1e-9)
+
+    local p = Pose3d.new():rotateBy(yaw)
+    lu.assertEquals(p:translation():norm(), 0)
+    lu.assertAlmostEquals(p:rotation():angle(), math.pi / 2, 1e-9)
+end
@@ -2,22 +2,84 @@
 # SPDX-License-Identifier: MIT
 
 import io, yaml
+import hashlib
 import os
+import pickle
+import re
+
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+class Template:
+    '''A text template, compiled once into literal and field nodes.
+
+    `@NAME@` is replaced by a value, either a string or a list of strings.
+    `@IF NAME@...@ELSE@...@END@` picks a branch by the value's truth and
+    may nest. Rendering appends to one list that is joined once, so output
+    stays linear in the number of fields filled in.
+    '''
+    TOKEN = re.compile (r'@(IF [A-Z_]+|ELSE|END|[A-Z_]+)@')
+
+    def __init__ (self, text: str):
+        parts = self.TOKEN.split (text)
+        self.nodes, i, end = self._compile (parts, 0)
+        if end is not None:
+            raise Exception ('template: unexpected @%s@' % end)
+
+    def _compile (self, parts, i):
+        nodes = []
+        while i < len(parts):
+            literal = parts[i]
+            if len(literal) > 0:
+                nodes.append ((0, literal))
+            if i + 1 >= len(parts):
+                return nodes, i + 2, None
+            token = parts[i + 1]
+            i += 2
+            if token in ('ELSE', 'END'):
+                return nodes, i, token
+            if token.startswith ('IF '):
+                then, i, end = self._compile (parts, i)
+                otherwise = []
+                if end == 'ELSE':
+                    otherwise, i, end = self._compile (parts, i)
+                if end != 'END':
+                    raise Exception ('template: @%s@ without @END@' % token)
+                nodes.append ((2, token[3:], then, otherwise))
+            else:
+                nodes.append ((1, token))
+        return nodes, i, None
+
+    def render_into (self, out: list, values: dict):
+        stack = [iter (self.nodes)]
+        while len(stack) > 0:
+            node = next (stack[-1], None)
+            if node is None:
+                stack.pop()
+            elif node[0] == 0:
+                out.append (node[1])
+            elif node[0] == 1:
+                value = values[node[1]]
+                if isinstance (value, str):
+                    out.append (value)
+                else:
+                    out.extend (value)
+            else:
+                stack.append (iter (node[2] if values.get (node[1]) else node[3]))
+        return out
 
-T_FRC_LUA_CLASS = '''
+    def render (self, **values) -> str:
+        return ''.join (self.render_into ([], values))
+
+T_LUA_CLASS = '''
 ---SPDX-FileCopyrightText: Michael Fisher @mfisher31
 ---SPDX-License-Identifier: MIT
 
 local ffi = require ('ffi')
-
-ffi.cdef[[
-void free(void* ptr);
-@CDEF@
-]]
-
-pcall(ffi.load, 'luabot-ffi', true)
-local lib = ffi.C
-
+local lib = require ('@DECLS@')
+@REQUIRES@
 ---@TYPENAME@ wrapper
 ---@class @TYPENAME@
 local @TYPENAME@ = {}
@@ -33,6 +95,142 @@ ffi.metatype('@CTYPE@', @TYPENAME@_mt)
 return @TYPENAME@
 '''
 
+T_LUA_CTOR = '''function @TYPENAME@.new(...)
+    return @IF FREE@ffi.gc (lib.@NEW@ (...), lib.@FREE@)@ELSE@lib.@NEW@ (...)@END@
+end@IF FREE@
+
+---Free the underlying object now instead of waiting for the GC.
+---The object must not be used afterwards.
+function @TYPENAME@:release()
+    ffi.gc (self, nil)
+    lib.@FREE@ (self)
+end@END@'''
+
+T_LUA_METHOD = '''@IF ALIAS@@TYPENAME@.@NAME@ = lib.@SYMBOL@
+@ELSE@function @TYPENAME@@SEP@@NAME@(@PARAMS@)
+@PRELUDE@    @BODY@
+end
+@END@
+'''
+
+FFI_DECLS_MODULE = 'luabot.ffi_decls'
+
+T_FFI_DECLS = '''
+---SPDX-FileCopyrightText: Michael Fisher @mfisher31
+---SPDX-License-Identifier: MIT
+
+---C declarations for every generated binding, parsed once per Lua state.
+local ffi = require ('ffi')
+
+ffi.cdef[[
+void free(void* ptr);
+
+@CDEF@
+]]
+
+pcall(ffi.load, 'luabot-ffi', true)
+return ffi.C
+'''
+
+T_CPP_IMPL = '''#include <wpi/SymbolExports.h>
+#include <@HEADER@>
+@INCLUDES@
+#include <luabot/luabot.h>
+
+@LAYOUTS@extern "C" { 
+
+@IF OPAQUE@@OPAQUE@;
+
+@END@@IF FREE@LUABOT_EXPORT void @FREE@ (@CTYPE@* self) {
+    delete (@QTYPE@*) self;
+}@END@
+
+@METHODS@} // extern "C"
+'''
+
+T_CPP_METHOD = '''LUABOT_EXPORT @RETURN@ @SYMBOL@ (@PARAMS@) {
+@BODY@}
+
+'''
+
+T_CPP_RETURN = '''    return @IF VALUE@luabot_to_value (@CALL@)@ELSE@@CALL@@END@;
+'''
+
+# Guarded, since classes using a value type repeat its layout
+T_CPP_VALUE_LAYOUT = '''#ifndef LUABOT_VALUE_TYPE_@CTYPE@
+#define LUABOT_VALUE_TYPE_@CTYPE@
+
+#include <bit>
+#include <cstddef>
+#include <type_traits>
+
+@DECL@;
+
+@ASSERTS@static_assert (std::is_trivially_copyable_v<@QTYPE@>, "@QTYPE@ must be trivially copyable");
+
+static inline @CTYPE@ luabot_to_value (const @QTYPE@& value) {
+    return std::bit_cast<@CTYPE@> (value);
+}
+
+#endif
+
+'''
+
+T_LUA_STUB = '''---@meta
+---SPDX-FileCopyrightText: Michael Fisher @mfisher31
+---SPDX-License-Identifier: MIT
+
+---@TYPENAME@ wrapper
+---@class @TYPENAME@
+@FIELDS@local @TYPENAME@ = {}
+
+@FUNCTIONS@return @TYPENAME@
+'''
+
+T_LUA_STUB_FUNCTION = '''@ANNOTATIONS@function @TYPENAME@@SEP@@NAME@(@PARAMS@) end
+
+'''
+
+TEMPLATES = {
+    'lua_class':         Template (T_LUA_CLASS),
+    'lua_ctor':          Template (T_LUA_CTOR),
+    'lua_method':        Template (T_LUA_METHOD),
+    'ffi_decls':         Template (T_FFI_DECLS),
+    'cpp_impl':          Template (T_CPP_IMPL),
+    'cpp_method':        Template (T_CPP_METHOD),
+    'cpp_return':        Template (T_CPP_RETURN),
+    'cpp_value_layout':  Template (T_CPP_VALUE_LAYOUT),
+    'lua_stub':          Template (T_LUA_STUB),
+    'lua_stub_function': Template (T_LUA_STUB_FUNCTION),
+}
+
+# Per-namespace overrides of TEMPLATES, text keyed by template name, e.g.
+# {'cs': {'lua_class': T_CS_LUA_CLASS}}.
+NAMESPACE_TEMPLATE_TEXT = {
+    'frc': {},
+    'cs':  {},
+    'nt':  {},
+}
+
+def compile_namespace_templates (text):
+    """Compile per-namespace template text, each name must be in TEMPLATES"""
+    compiled = {}
+    for ns, overrides in text.items():
+        unknown = sorted (set (overrides) - set (TEMPLATES))
+        if len(unknown) > 0:
+            raise Exception ("namespace '%s' overrides unknown templates: %s" \
+                             % (ns, ', '.join (unknown)))
+        compiled[ns] = { name: Template (t) for name, t in overrides.items() }
+    return compiled
+
+# NAMESPACE_TEMPLATE_TEXT compiled once at import
+NAMESPACE_TEMPLATES = compile_namespace_templates (NAMESPACE_TEMPLATE_TEXT)
+
+def template (obj, name):
+    """The namespace's override of TEMPLATES[name], or TEMPLATES[name]"""
+    override = NAMESPACE_TEMPLATES.get (obj.get ('namespace'), {}).get (name)
+    return override if override is not None else TEMPLATES[name]
+
 def parse_options():
     from optparse import OptionParser
 
@@ -43,21 +241,412 @@ def parse_options():
         help="Path to bindings YAML and other files", 
         default='bindings')
     parser.add_option("-f", "--format", dest="format",
-        help="Output format to generate", default='lua')
+        help="Output format to generate: lua, c or stubs (LuaLS definitions "
+             "plus %s)" % SYMBOLS_FILE, default='lua')
     parser.add_option("-o", "--out", dest="output",
         help="write report to FILE",
         default='',
         metavar="FILE")
+    parser.add_option("--cache", dest="cache",
+        help="Cache parsed YAML class definitions in FILE",
+        default='', metavar="FILE")
+    parser.add_option("-j", "--jobs", dest="jobs", type="int",
+        help="Render with N worker processes (0 for one per CPU)",
+        default=1, metavar="N")
+    parser.add_option("--batch", dest="batch",
+        help="Generate Lua and C++ for every YAML in a single run",
+        action='store_true', default=False)
+    parser.add_option("--lua-dir", dest="lua_dir",
+        help="Batch mode Lua output directory (default: OUT/lua)",
+        default='', metavar="DIR")
+    parser.add_option("--cpp-dir", dest="cpp_dir",
+        help="Batch mode C++ output directory (default: OUT/include/luabot/ffi)",
+        default='', metavar="DIR")
+    parser.add_option("--depfile", dest="depfile",
+        help="Batch mode: write a Makefile style depfile to FILE",
+        default='', metavar="FILE")
+    parser.add_option("--stamp", dest="stamp",
+        help="Batch mode: write the list of generated files to FILE",
+        default='', metavar="FILE")
 
     return parser.parse_args()
 
 def lowerfirst(input: str):
     return input[0].lower() + input[1:]
 
+# Parsed class definitions keyed by absolute path: {path: (sha256, obj)}
+CLASS_DEF_CACHE_VERSION = 2
+class_def_cache = None
+class_def_cache_dirty = False
+
+def load_class_def_cache (path):
+    global class_def_cache, class_def_cache_dirty
+    class_def_cache = {}
+    class_def_cache_dirty = False
+    try:
+        with open (path, 'rb') as f:
+            version, entries = pickle.load (f)
+        if version == CLASS_DEF_CACHE_VERSION:
+            class_def_cache = entries
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+        pass
+
+def save_class_def_cache (path):
+    global class_def_cache_dirty
+    if class_def_cache is None or not class_def_cache_dirty:
+        return
+    for k in [k for k in class_def_cache if not os.path.exists (k)]:
+        del class_def_cache[k]
+    os.makedirs (os.path.dirname (os.path.abspath (path)), exist_ok=True)
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    with open (tmp, 'wb') as f:
+        pickle.dump ((CLASS_DEF_CACHE_VERSION, class_def_cache), f,
+                     pickle.HIGHEST_PROTOCOL)
+    os.replace (tmp, path)
+    class_def_cache_dirty = False
+
+class BindingError (Exception):
+    """Invalid binding YAML, one 'file:line:col: message' per problem"""
+    def __init__ (self, errors):
+        super().__init__ (errors)
+        self.errors = errors
+
+    def __str__ (self):
+        return '\n'.join (self.errors)
+
+class Mapping (dict):
+    """A YAML mapping that remembers where it and each of its keys are.
+
+    marks holds 1-based (line, col) pairs keyed like the dict itself.
+    """
+    def __init__ (self, mark = (1, 1)):
+        super().__init__()
+        self.mark = mark
+        self.marks = {}
+
+    def where (self, key = None):
+        return self.marks.get (key, self.mark)
+
+def yaml_mark (node):
+    return (node.start_mark.line + 1, node.start_mark.column + 1)
+
+class BindingLoader (YamlLoader):
+    """YamlLoader building Mappings, and noting duplicate keys in errors"""
+    def __init__ (self, stream):
+        super().__init__ (stream)
+        self.errors = []
+
+def construct_binding_mapping (loader, node):
+    seen = {}
+    for key_node, _ in node.value:
+        if key_node.tag == 'tag:yaml.org,2002:merge':
+            continue
+        key = loader.construct_object (key_node, deep=True)
+        if key in seen:
+            loader.errors.append ((yaml_mark (key_node),
+                "duplicate key '%s', first defined at line %d" % (key, seen[key][0])))
+        else:
+            seen[key] = yaml_mark (key_node)
+
+    loader.flatten_mapping (node)
+    mapping = Mapping (yaml_mark (node))
+    for key_node, value_node in node.value:
+        key = loader.construct_object (key_node, deep=True)
+        mapping[key] = loader.construct_object (value_node, deep=True)
+        mapping.marks[key] = yaml_mark (key_node)
+    return mapping
+
+BindingLoader.add_constructor ('tag:yaml.org,2002:map', construct_binding_mapping)
+
+def load_class_def (file, data):
+    loader = BindingLoader (data)
+    try:
+        obj = loader.get_single_data()
+    except yaml.MarkedYAMLError as e:
+        mark = e.problem_mark or e.context_mark
+        raise BindingError (['%s:%d:%d: %s' % (file, mark.line + 1, mark.column + 1, e.problem)])
+    finally:
+        loader.dispose()
+    return validate_class_def (file, obj, loader.errors)
+
 def open_class_def (file):
-    with open(file) as stream:
-        obj = yaml.safe_load (stream)
-        return obj
+    global class_def_cache_dirty
+    with open(file, 'rb') as stream:
+        data = stream.read()
+
+    if class_def_cache is None:
+        return load_class_def (file, data)
+
+    key = os.path.abspath (file)
+    digest = hashlib.sha256 (data).hexdigest()
+    hit = class_def_cache.get (key)
+    if hit is not None and hit[0] == digest:
+        return hit[1]
+
+    obj = load_class_def (file, data)
+    class_def_cache[key] = (digest, obj)
+    class_def_cache_dirty = True
+    return obj
+
+CLASS_FIELDS = {
+    'typename', 'namespace', 'header', 'includes', 'doxygen', 'templates',
+    'constructor', 'destructor', 'direct', 'value_type', 'fields',
+    'structs', 'methods'
+}
+METHOD_FIELDS = {
+    'return_type', 'params', 'static', 'const', 'factory', 'stub',
+    'direct', 'c_body', 'lua_body'
+}
+PARAM_FIELDS = { 'type', 'array', 'out' }
+STRUCT_FIELDS = { 'cpp', 'fields' }
+
+C_TYPES = {
+    'void', 'bool', 'char', 'int', 'float', 'double', 'size_t',
+    'int8_t', 'int16_t', 'int32_t', 'int64_t',
+    'uint8_t', 'uint16_t', 'uint32_t', 'uint64_t'
+}
+
+def is_c_type (t):
+    """A C scalar, or a pointer to one such as 'const char*'"""
+    t = t.strip()
+    if t.startswith ('const '):
+        t = t[6:].strip()
+    return t.rstrip ('*').strip() in C_TYPES
+
+CLASS_NAME = re.compile (r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+def is_class_name (t):
+    """A name that may refer to another binding, checked by check_type_refs"""
+    return CLASS_NAME.match (t) is not None and not is_c_type (t) \
+        and t not in ('cptr', 'string', 'const-cptr')
+
+def validate_class_def (file, obj, errors = []):
+    """Check a parsed binding and fill in defaults before rendering.
+
+    Reports duplicate keys, unknown fields and types, missing fields and
+    generated names that collide, all located as file:line:col. Raises
+    BindingError listing every problem found.
+    """
+    problems = list (errors)
+    def error (where, message):
+        problems.append ((where, message))
+
+    def check_fields (mapping, known, what):
+        for k in mapping:
+            if k not in known:
+                error (mapping.where (k), "unknown %s field '%s'" % (what, k))
+
+    if not isinstance (obj, Mapping):
+        raise BindingError (['%s:1:1: expected a mapping at the top level' % file])
+
+    check_fields (obj, CLASS_FIELDS, 'class')
+    missing = [k for k in ('typename', 'namespace', 'header') \
+               if not isinstance (obj.get (k), str) or len(obj[k].strip()) <= 0]
+    for k in missing:
+        error (obj.where (k), "'%s' is required" % k)
+    if len(missing) > 0:
+        return raise_problems (file, problems)
+
+    if obj.get ('methods') is None:
+        obj['methods'] = Mapping (obj.mark)
+    malformed = [k for k in ('methods', 'structs') \
+                 if obj.get (k) is not None and not isinstance (obj[k], Mapping)]
+    for k in malformed:
+        error (obj.where (k), "'%s' must be a mapping" % k)
+    if len(malformed) > 0:
+        return raise_problems (file, problems)
+
+    structs = obj.get ('structs') or Mapping (obj.mark)
+    for name, st in structs.items():
+        if not isinstance (st, Mapping) or not isinstance (st.get ('fields'), Mapping):
+            error (structs.where (name), "struct '%s' needs fields" % name)
+            continue
+        check_fields (st, STRUCT_FIELDS, 'struct')
+        check_struct_fields (st['fields'], error)
+    if is_value_type (obj):
+        if not isinstance (obj.get ('fields'), Mapping):
+            error (obj.where ('value_type'), 'value_type requires fields')
+        else:
+            check_struct_fields (obj['fields'], error)
+
+    methods = obj['methods']
+    for k in list (methods):
+        m = methods[k]
+        if m is None:
+            m = methods[k] = Mapping (methods.where (k))
+        if not isinstance (m, Mapping):
+            error (methods.where (k), "method '%s' must be a mapping" % k)
+            continue
+        check_fields (m, METHOD_FIELDS, 'method')
+
+        rt = m.get ('return_type')
+        if rt is not None and (not isinstance (rt, str) or (rt not in ('cptr', 'string') \
+                and not is_c_type (rt) and not is_class_name (rt))):
+            error (m.where ('return_type'), "unknown return_type '%s'" % rt)
+
+        params = m.get ('params')
+        if params is None:
+            params = m['params'] = Mapping (m.where ())
+        if not isinstance (params, Mapping):
+            error (m.where ('params'), "params of method '%s' must be a mapping" % k)
+            continue
+        for p, t in params.items():
+            if isinstance (t, Mapping):
+                check_fields (t, PARAM_FIELDS, 'param')
+                elem = t.get ('type')
+                if not isinstance (elem, str):
+                    error (t.where ('type'), "param '%s' needs a type" % p)
+                elif elem not in structs and not is_c_type (elem) and not is_class_name (elem):
+                    error (t.where ('type'), "unknown param type '%s'" % elem)
+                for flag in ('array', 'out'):
+                    if not isinstance (t.get (flag, False), bool):
+                        error (t.where (flag), "param '%s' %s must be true or false" % (p, flag))
+            elif not isinstance (t, str) or (t != 'const-cptr' and not is_c_type (t) \
+                    and not is_class_name (t)):
+                error (params.where (p), "unknown param type '%s'" % t)
+
+    check_collisions (obj, error)
+    if len(problems) > 0:
+        return raise_problems (file, problems)
+    return obj
+
+def check_struct_fields (fields, error):
+    for name, t in fields.items():
+        base = str (t).split ('[')[0]
+        if not is_c_type (base) or '*' in base:
+            error (fields.where (name), "unknown field type '%s'" % t)
+
+def check_collisions (obj, error):
+    """Generated Lua names and C symbols must be unique within a class"""
+    methods = obj['methods']
+    lua = { 'new': obj.where ('typename') }
+    if has_destructor (obj) and 'New' in methods:
+        lua['release'] = obj.where ('destructor')
+    csyms = {}
+    if has_destructor (obj):
+        csyms[csymbol (obj, 'Free')] = obj.where ('destructor')
+
+    structs = obj.get ('structs') or {}
+    for name in structs:
+        lua[name] = structs.where (name)
+    if is_value_type (obj) and isinstance (obj.get ('fields'), Mapping):
+        for name in obj['fields']:
+            lua[name] = obj['fields'].where (name)
+
+    for k in methods:
+        where = methods.where (k)
+        sym = csymbol (obj, k)
+        if sym in csyms:
+            error (where, "'%s' collides with generated symbol %s from line %d" \
+                % (k, sym, csyms[sym][0]))
+        csyms[sym] = where
+        if methods[k].get ('factory', False):
+            continue
+        name = lowerfirst (k)
+        if name in lua:
+            error (where, "'%s' collides with generated Lua name '%s' from line %d" \
+                % (k, name, lua[name][0]))
+        lua[name] = where
+
+def raise_problems (file, problems):
+    problems.sort()
+    raise BindingError (['%s:%d:%d: %s' % (file, line, col, message)
+                         for (line, col), message in problems])
+
+def class_def_symbols (obj):
+    """C level names a class defines, with the line they come from"""
+    out = [(ctype (obj), obj.where ('typename'))]
+    if has_destructor (obj):
+        out.append ((csymbol (obj, 'Free'), obj.where ('destructor')))
+    structs = obj.get ('structs') or {}
+    for name in structs:
+        out.append ((struct_ctype (obj, name), structs.where (name)))
+    for k in obj['methods']:
+        out.append ((csymbol (obj, k), obj['methods'].where (k)))
+    return out
+
+# Every YAML defined class by typename, so methods can take and return
+# other bindings: {typename: registry_entry (obj, module)}
+type_registry = {}
+
+def registry_entry (obj, module):
+    """What other bindings need to know about obj to use it as a type"""
+    entry = { k: obj[k] for k in ('typename', 'namespace', 'header', 'value_type',
+                                  'fields', 'destructor') if k in obj }
+    entry['module'] = module
+    return entry
+
+def yaml_module (dir, file):
+    """Lua module name of a YAML under dir, or None if outside it"""
+    rel = os.path.relpath (os.path.abspath (file), dir)
+    if rel.startswith ('..'):
+        return None
+    return os.path.splitext (rel)[0].replace (os.sep, '.')
+
+def build_type_registry (dir, files):
+    """Collect the classes defined by files, before any are rendered.
+
+    Files that fail to load are left out, their errors are reported when
+    they are rendered.
+    """
+    registry = {}
+    for f in sorted (files):
+        try:
+            obj = open_class_def (f)
+        except Exception:
+            continue
+        registry.setdefault (obj['typename'], registry_entry (obj, yaml_module (dir, f)))
+    return registry
+
+def set_type_registry (registry):
+    global type_registry
+    type_registry = registry
+
+def registered_type (t):
+    """The registry entry for a class referenced by name, else None"""
+    return type_registry.get (t) if isinstance (t, str) else None
+
+def referenced_types (obj):
+    """Registered classes, other than obj, used in obj's method signatures"""
+    out = {}
+    for method in obj['methods'].values():
+        names = [method.get ('return_type')]
+        for t in method.get ('params', {}).values():
+            names.append (t.get ('type') if isinstance (t, dict) else t)
+        for name in names:
+            entry = registered_type (name)
+            if entry is not None and name != obj['typename']:
+                out[name] = entry
+    return [out[k] for k in sorted (out)]
+
+def check_type_refs (file, obj):
+    """Class names used as types must be in the registry.
+
+    Runs at render time, once every YAML has been loaded, where
+    validate_class_def only knows about C types.
+    """
+    problems = []
+    structs = obj.get ('structs') or {}
+    def check (where, t, what):
+        if isinstance (t, str) and is_class_name (t) and t not in structs \
+                and registered_type (t) is None:
+            problems.append ((where, "unknown %s '%s'" % (what, t)))
+
+    for k, m in obj['methods'].items():
+        check (m.where ('return_type'), m.get ('return_type'), 'return_type')
+        params = m.get ('params', {})
+        for p, t in params.items():
+            if isinstance (t, Mapping):
+                check (t.where ('type'), t.get ('type'), 'param type')
+                entry = registered_type (t.get ('type'))
+                if entry is not None and t.get ('array', False) and not is_value_type (entry):
+                    problems.append ((t.where ('type'),
+                        "array of '%s' needs a value_type" % t['type']))
+            else:
+                check (params.where (p), t, 'param type')
+
+    if len(problems) > 0:
+        raise_problems (file, problems)
 
 def qualified_type (obj):
     return '%s::%s' % (obj['namespace'], obj['typename'])
@@ -68,6 +657,50 @@ def cprefix (obj):
 def ctype (obj):
     return '%s%s' % (cprefix(obj), obj['typename'])
 
+def param_spec (obj, t):
+    """Normalize a param type to {'type', 'array', 'out', 'cpp'}.
+
+    Params are either a plain C type or a mapping such as
+    `{type: LEDData, array: true}`. Array params become a pointer plus a
+    `<name>Length` count in C and a std::span in C++. Other mappings are
+    passed by pointer, writable with `out: true`. Types can name one of
+    the YAML's `structs` or a registered class. A class named on its own,
+    e.g. `other: Rotation3d`, is passed by const pointer and dereferenced
+    for the C++ call (`ref`), matching a `const Rotation3d&` parameter.
+    """
+    if not isinstance (t, dict):
+        entry = registered_type (t)
+        if entry is not None:
+            return { 'type': ctype (entry), 'array': False, 'pointer': True,
+                     'out': False, 'ref': True, 'cpp': qualified_type (entry) }
+        if t == 'const-cptr':
+            t = 'const %s*' % ctype(obj)
+        return { 'type': t, 'array': False, 'pointer': False, 'out': False,
+                 'ref': False, 'cpp': t }
+
+    elem = t['type']
+    cpp = elem
+    entry = registered_type (elem)
+    if elem in obj.get ('structs', {}):
+        elem = struct_ctype (obj, elem)
+        cpp = obj['structs'][t['type']].get ('cpp', elem)
+    elif entry is not None:
+        elem = ctype (entry)
+        cpp = qualified_type (entry)
+    return {
+        'type': elem,
+        'array': t.get ('array', False),
+        'pointer': not t.get ('array', False),
+        'out': t.get ('out', False),
+        'ref': False,
+        'cpp': cpp
+    }
+
+def array_params (obj, method):
+    params = method.get ('params', {})
+    return [(p, param_spec (obj, params[p])) for p in params \
+            if param_spec (obj, params[p])['array']]
+
 def lparams (method):
     params = method.get ('params', {})
 
@@ -77,6 +710,8 @@ def lparams (method):
     for p in params:
         if n > 0: ps += ', '
         ps += '%s' % (p)
+        if isinstance (params[p], dict) and params[p].get ('array', False):
+            ps += ', %sLength' % (p)
         n += 1
 
     return ps
@@ -95,17 +730,40 @@ def cparams (obj, method):
 
     n = 0
     for p in params:
-        t = params[p]
-        if t == 'const-cptr':
-            t = 'const %s*' % ctype(obj)
+        spec = param_spec (obj, params[p])
+        t = spec['type']
         
         if (n == 0 and use_self) or n > 0:
             ps += ', '
-        ps += '%s %s' % (t, p)
+        const = '' if spec['out'] else 'const '
+        if spec['array']:
+            ps += '%s%s* %s, size_t %sLength' % (const, t, p, p)
+        elif spec['pointer']:
+            ps += '%s%s* %s' % (const, t, p)
+        else:
+            ps += '%s %s' % (t, p)
         n += 1
 
     return ps
 
+def cargs (obj, method):
+    """C++ call arguments for a generated body, array params become spans."""
+    params = method.get ('params', {})
+    args = []
+    for p in params:
+        spec = param_spec (obj, params[p])
+        const = '' if spec['out'] else 'const '
+        if spec['array']:
+            args.append ('std::span<%s%s> ((%s%s*) %s, %sLength)' % \
+                (const, spec['cpp'], const, spec['cpp'], p, p))
+        elif spec['ref']:
+            args.append ('*(const %s*) %s' % (spec['cpp'], p))
+        elif spec['pointer']:
+            args.append ('(%s%s*) %s' % (const, spec['cpp'], p))
+        else:
+            args.append (p)
+    return ', '.join (args)
+
 def csymbol (obj, ms):
     return '%s%s%s' % (obj['namespace'], obj['typename'], ms)
     
@@ -114,32 +772,142 @@ def declare_opaque_ctype (obj):
 
 def declare_ffi_ctype (obj):
     ct = ctype (obj)
+    if is_value_type (obj):
+        return declare_value_ctype (obj)
     return 'typedef struct %s %s' % (ct, ct)
 
+# Sizes used to check value_type field offsets, other types are unchecked
+VALUE_FIELD_SIZES = {
+    'bool': 1, 'int8_t': 1, 'uint8_t': 1,
+    'int16_t': 2, 'uint16_t': 2,
+    'int': 4, 'int32_t': 4, 'uint32_t': 4, 'float': 4,
+    'int64_t': 8, 'uint64_t': 8, 'double': 8,
+}
+
+def is_value_type (obj):
+    return obj.get ('value_type', False)
+
+def parse_fields (owner, fields):
+    """Struct fields as (name, type, count), count 0 if not an array."""
+    out = []
+    for name, t in fields.items():
+        t = str (t).strip()
+        count = 0
+        if t.endswith (']'):
+            t, n = t[:-1].split ('[')
+            t = t.strip()
+            count = int (n)
+        out.append ((name, t, count))
+
+    if len(out) <= 0:
+        raise Exception ('%s: struct requires fields' % owner)
+    return out
+
+def value_fields (obj):
+    return parse_fields (obj['typename'], obj.get ('fields', {}))
+
+def struct_ctype (obj, name):
+    return ctype (obj) + name
+
+def declare_struct (ct, fields):
+    # One line, so the shared decls module never dedupes a field away
+    fs = []
+    for name, t, count in fields:
+        fs.append ('%s %s%s; ' % (t, name, '[%d]' % count if count > 0 else ''))
+    return 'typedef struct %s { %s} %s' % (ct, ''.join (fs), ct)
+
+def declare_value_ctype (obj):
+    return declare_struct (ctype (obj), value_fields (obj))
+
+def struct_fields (obj, name):
+    s = obj['structs'][name]
+    return parse_fields ('%s.%s' % (obj['typename'], name), s['fields'])
+
+def declare_structs (obj):
+    '''Declarations for the YAML's `structs`, used as param types.
+
+    A struct with a `cpp` type is layout checked against it, one without
+    is plain C data filled in by a c_body.
+    '''
+    return ''.join (declare_struct (struct_ctype (obj, name), struct_fields (obj, name)) + ';\n'
+                    for name in obj.get ('structs', {}))
+
+def gen_layout_asserts (ct, qtype, fields):
+    '''Layout checks for a C struct standing in for a C++ type.
+
+    sizeof and alignof compare against the C++ type itself. C++ members
+    are private, so the offsetof checks only pin the C declaration to the
+    natural layout computed here; they catch a cdef that drifts, not a
+    mismatch with the C++ members.
+    '''
+    out = [
+        'static_assert (sizeof (%s) == sizeof (%s), "%s size does not match %s");\n' \
+            % (ct, qtype, ct, qtype),
+        'static_assert (alignof (%s) == alignof (%s), "%s alignment does not match %s");\n' \
+            % (ct, qtype, ct, qtype)
+    ]
+
+    offset = 0
+    for name, t, count in fields:
+        if offset is None or t not in VALUE_FIELD_SIZES:
+            offset = None
+            continue
+        # Scalars are aligned to their size, arrays to their element's
+        align = VALUE_FIELD_SIZES[t]
+        offset = (offset + align - 1) // align * align
+        out.append ('static_assert (offsetof (%s, %s) == %d, "%s::%s is not at offset %d");\n' \
+            % (ct, name, offset, ct, name, offset))
+        offset += VALUE_FIELD_SIZES[t] * max (count, 1)
+    return ''.join (out)
+
+def gen_struct_layouts (obj):
+    out = []
+    for name, s in obj.get ('structs', {}).items():
+        ct = struct_ctype (obj, name)
+        fields = struct_fields (obj, name)
+        out.append (declare_struct (ct, fields) + ';\n\n')
+        if 'cpp' in s:
+            out.append (gen_layout_asserts (ct, s['cpp'], fields) + '\n')
+    return ''.join (out)
+
+def creturn (obj, method):
+    rt = method.get ('return_type')
+    if rt == None: rt = 'void'
+    entry = registered_type (rt)
+    if rt == 'cptr':
+        rt = ctype (obj) if is_value_type (obj) else ctype (obj) + '*'
+    elif entry is not None:
+        rt = ctype (entry) if is_value_type (entry) else ctype (entry) + '*'
+    if rt == 'string': rt = 'char*'
+    return rt
+
+def owned_return (method):
+    '''Registry entry if method returns a heap allocated class, else None'''
+    entry = registered_type (method.get ('return_type'))
+    if entry is None or is_value_type (entry):
+        return None
+    return entry
+
+def has_destructor (obj):
+    return obj.get ('destructor', True) and not is_value_type (obj)
+
 def gen_ffi_cdef (obj):
-    ns = obj['namespace']
-    typename = obj['typename']
     ct = ctype(obj)
-    out = declare_ffi_ctype (obj) + ';\n\n'
+    # Repeated per user, gen_ffi_decls keeps the first of each
+    out = [declare_ffi_ctype (entry) + ';\n' for entry in referenced_types (obj)]
+    out += [declare_ffi_ctype (obj), ';\n', declare_structs (obj), '\n']
 
-    if obj.get ('destructor', True):
-        out +=  'void %s(%s* self);' % (csymbol (obj,'Free'), ct)
+    if has_destructor (obj):
+        out.append ('void %s(%s* self);' % (csymbol (obj,'Free'), ct))
     
-    out += '\n\n'
+    out.append ('\n\n')
 
     for k in obj['methods']:
         method = obj['methods'][k]
-        rt = method.get('return_type')
-        if rt == None: rt = 'void'
-        if rt == 'cptr': rt = ct + "*"
-        if rt == 'string': rt = 'char*'
-
-        ps = cparams (obj, method)
-        
-        out += '%s %s%s%s(%s);\n' % \
-            (rt, obj['namespace'], typename, k, ps)
+        out.append ('%s %s(%s);\n' % \
+            (creturn (obj, method), csymbol (obj, k), cparams (obj, method)))
     
-    return out.strip()
+    return ''.join (out).strip()
 
 def gen_ffi_ctor_metatable (obj):
     out = '''
@@ -154,131 +922,365 @@ setmetatable(%s, {
 
 
 def gen_ffi_ctor (obj):
-    out = '''
-function %s.new(...)
-    return lib.%s (...)
-end
-''' % (obj['typename'], csymbol (obj, 'New'))
-
-    return out.strip()
+    # Owned objects are freed by the GC, or sooner with release()
+    owned = has_destructor (obj) and 'New' in obj['methods']
+    return template (obj, 'lua_ctor').render (
+        TYPENAME = obj['typename'],
+        NEW = csymbol (obj, 'New'),
+        FREE = csymbol (obj, 'Free') if owned else '')
+
+def is_direct (obj, method):
+    '''True if method is bound straight to its C symbol.
+
+    Set `direct: true` on a YAML to alias every pass-through method, or on
+    a method to alias just that one. A method level `direct: false` wins.
+    Methods with a lua_body are never aliased. Off by default: aliases are
+    resolved when the module loads, so one missing symbol fails the whole
+    require, they keep C function cdata in the class table, and extra
+    arguments raise instead of being dropped. Enable it on a binding only
+    with `benchmark.py --compare` numbers showing it pays.
+    '''
+    if len(method.get ('lua_body', '').strip()) > 0:
+        return False
+    if len(array_params (obj, method)) > 0:
+        return False
+    if owned_return (method) is not None:
+        return False
+    return method.get ('direct', obj.get ('direct', False))
+
+def gen_ffi_structs (obj):
+    '''Array constructors for the YAML's `structs`, e.g. LED.LEDData(n)'''
+    return ''.join ("%s.%s = ffi.typeof ('%s[?]')\n" \
+            % (obj['typename'], name, struct_ctype (obj, name))
+        for name in obj.get ('structs', {}))
 
 def gen_ffi_methods (obj):
-    out = ''
+    out = [gen_ffi_structs (obj)]
+    if len(out[0]) > 0:
+        out.append ('\n')
+
+    method_t = template (obj, 'lua_method')
     for k in obj['methods']:
         m = obj['methods'][k]
     
         if m.get ('factory', False):
             continue
-    
-        sep = ':' 
-        if m.get('static', False):
-            sep = '.'
 
-        sym = csymbol(obj, k)
+        values = {
+            'TYPENAME': obj['typename'],
+            'NAME':     lowerfirst (k),
+            'SYMBOL':   csymbol (obj, k),
+            # Pass-through methods can bind the C function directly, so the
+            # JIT sees a plain C call instead of a Lua wrapper.
+            'ALIAS':    is_direct (obj, m),
+            'SEP':      '.' if m.get ('static', False) else ':',
+            'PRELUDE':  [],
+        }
+        if values['ALIAS']:
+            method_t.render_into (out, values)
+            continue
+
         ps = lparams(m)
-        out += 'function %s%s%s(%s)\n' % \
-                (obj['typename'], sep, lowerfirst (k), ps)
-        
-        if not m.get('static', False) and not m.get('factory', False):
-            if (len(ps.strip()) <= 0):
-                ps = 'self'
-            else:
-                ps = 'self, ' + ps
+        values['PARAMS'] = ps
+        if not m.get('static', False):
+            ps = 'self' if len(ps.strip()) <= 0 else 'self, ' + ps
 
         ccall = m.get('lua_body', '').strip()
         if len(ccall) <= 0:
-            ccall = 'lib.%s(%s)' % (sym, ps)
+            # Array lengths default to the size of an ffi.new'd VLA
+            values['PRELUDE'] = [
+                "    %sLength = %sLength or ffi.sizeof (%s) / ffi.sizeof ('%s')\n" \
+                    % (p, p, p, spec['type'])
+                for p, spec in array_params (obj, m)
+            ]
+            ccall = 'lib.%s(%s)' % (values['SYMBOL'], ps)
+            owned = owned_return (m)
+            if owned is not None and has_destructor (owned):
+                ccall = 'ffi.gc (%s, lib.%s)' % (ccall, csymbol (owned, 'Free'))
             rt = m.get ('return_type', 'void').strip()
             if rt != 'void':
                 ccall = 'return ' + ccall
 
-        out += '    %s\n' % ccall
-
-        out += 'end\n\n'
+        values['BODY'] = ccall
+        method_t.render_into (out, values)
     
-    return out.strip()
-
-def gen_ffi_class (obj):
-    return T_FRC_LUA_CLASS \
-        .replace ('@CTYPE@', ctype(obj)) \
-        .replace ('@TYPENAME@', obj['typename']) \
-        .replace ('@CLIB@', 'luabot-wpilibc') \
-        .replace ('@CDEF@', gen_ffi_cdef (obj)) \
-        .replace ('@CTOR@', gen_ffi_ctor (obj)) \
-        .replace ('@METHODS@', gen_ffi_methods (obj))
+    return ''.join (out).strip()
 
-def gen_ffi_body_string():
-    pass
+def gen_ffi_requires (obj):
+    '''Load the classes obj returns, so their metatypes are set'''
+    out = []
+    for method in obj['methods'].values():
+        entry = registered_type (method.get ('return_type'))
+        if entry is None or entry['typename'] == obj['typename'] \
+                or entry.get ('module') is None:
+            continue
+        line = "require ('%s')\n" % entry['module']
+        if line not in out:
+            out.append (line)
+    return sorted (out)
 
-def gen_ffi_impl (obj):
-    typename = obj['typename']
+def gen_ffi_class (obj):
+    return template (obj, 'lua_class').render (
+        CTYPE = ctype (obj),
+        TYPENAME = obj['typename'],
+        DECLS = FFI_DECLS_MODULE,
+        REQUIRES = gen_ffi_requires (obj),
+        CTOR = gen_ffi_ctor (obj),
+        METHODS = gen_ffi_methods (obj))
+
+TYPEDEF_NAME = re.compile (r'(\w+)\s*;$')
+FUNCTION_NAME = re.compile (r'(\w+)\s*\(')
+
+def cdef_name (line):
+    '''Type or function a cdef line declares, or the line without spacing'''
+    line = line.strip()
+    m = TYPEDEF_NAME.search (line) if line.startswith ('typedef ') \
+        else FUNCTION_NAME.search (line)
+    return m.group (1) if m is not None else ' '.join (line.split())
+
+def gen_ffi_decls (cdefs):
+    '''Merge per-class cdefs into the shared declaration module.
+
+    Each type and symbol is declared once, even if several classes repeat it
+    with different spacing. Types are declared ahead of every function, so a
+    class can use one defined by a class that sorts after it.
+    '''
+    seen = set()
+    types = []
+    blocks = []
+    for cdef in cdefs:
+        lines = []
+        for line in cdef.splitlines():
+            if len(line.strip()) > 0:
+                name = cdef_name (line)
+                if name in seen:
+                    continue
+                seen.add (name)
+            if line.startswith ('typedef '):
+                types.append (line)
+                continue
+            lines.append (line)
+        block = '\n'.join (lines).strip()
+        if len(block) > 0:
+            blocks.append (block)
+    if len(types) > 0:
+        blocks.insert (0, '\n'.join (types))
+    return TEMPLATES['ffi_decls'].render (CDEF = '\n\n'.join (blocks))
+
+def ffi_decls_path (lua_dir):
+    return os.path.join (lua_dir, *FFI_DECLS_MODULE.split ('.')) + '.lua'
+
+def gen_value_layout (obj):
+    '''C struct for a value_type, checked against the C++ class layout.
+
+    Fields must mirror the C++ members in declaration order. Values cross
+    the C boundary by copy, so the class must be trivially copyable.
+    '''
     qtypename = qualified_type (obj)
+    return template (obj, 'cpp_value_layout').render (
+        CTYPE = ctype (obj),
+        QTYPE = qtypename,
+        DECL = declare_value_ctype (obj),
+        ASSERTS = gen_layout_asserts (ctype (obj), qtypename, value_fields (obj)))
+
+def gen_ffi_impl_body (obj, k, method):
+    '''Body of one exported function: the c_body or a generated call.'''
+    qtypename = qualified_type (obj)
+    cbody = method.get ('c_body', '')
+    factory = method.get ('factory', False) and not len(cbody) > 0
+    static = method.get ('static', False)
 
-    out = '#include <wpi/SymbolExports.h>\n'
-    out += '#include <%s>\n\n' % obj['header']
-    out += "#include <luabot/luabot.h>\n\n"
-    out += 'extern "C" { \n\n'
-
-    ct = ctype(obj)
+    if len(cbody) > 0:
+        # Static bodies have always been indented one level, others not
+        return ('    ' if static and not factory else '') + cbody + '\n'
+    if method.get ('stub', False):
+        return ''
+
+    ls = cargs (obj, method)
+    value = is_value_type (obj) and (factory or method.get ('return_type') == 'cptr')
+    entry = registered_type (method.get ('return_type'))
+    if factory and value:
+        call = '%s (%s)' % (qtypename, ls)
+    elif factory:
+        call = '(%s*) new %s (%s)' % (ctype (obj), qtypename, ls)
+    elif static:
+        call = '%s::%s(%s)' % (qtypename, k, ls)
+    else:
+        call = '((%s*) self)->%s (%s)' % (qtypename, k, ls)
 
-    out += declare_opaque_ctype (obj) + ';\n\n'
+    # Classes returned by name are copied out, by value or onto the heap
+    if entry is not None and is_value_type (entry):
+        value = True
+    elif entry is not None:
+        call = '(%s*) new %s (%s)' % (ctype (entry), qualified_type (entry), call)
+    return template (obj, 'cpp_return').render (VALUE = value, CALL = call)
 
-    if obj.get ('destructor', True):
-        out += '''
-LUABOT_EXPORT void frc%sFree (%s* self) {
-    delete (%s*) self;
-}
-        '''.strip() % (typename, ct, qtypename)
-    
-    out += '\n\n'
+def gen_ffi_impl (obj):
+    value_type = is_value_type (obj)
+
+    layouts = []
+    if len(obj.get ('structs', {})) > 0:
+        layouts.append ('#include <cstddef>\n#include <span>\n\n')
+        layouts.append (gen_struct_layouts (obj))
+    if value_type:
+        layouts.append (gen_value_layout (obj))
+
+    includes = list (obj.get ('includes', []))
+    for entry in referenced_types (obj):
+        if entry['header'] not in includes and entry['header'] != obj['header']:
+            includes.append (entry['header'])
+        if is_value_type (entry):
+            layouts.append (gen_value_layout (entry))
+        else:
+            layouts.append ('%s;\n\n' % declare_opaque_ctype (entry))
 
+    method_t = template (obj, 'cpp_method')
+    methods = []
     for k in obj['methods']:
         method = obj['methods'][k]
-        stub = method.get('stub', False)
-
-        rt = method.get('return_type')
-        if rt == None: rt = 'void'
-        if rt == 'cptr': rt = ctype(obj) + '*'
-        if rt == 'string': rt = 'char*'
-
-        ps = cparams (obj, method)
-        ls = lparams (method)
-        cbody = method.get('c_body', '')
-
-        if method.get('factory', False) and not len(cbody) > 0:
-            out += 'LUABOT_EXPORT %s %s%s%s (%s) {\n' % \
-                (rt, obj['namespace'], typename, k, ps)
-            
-            if not stub:
-                out += '    return (%s*) new %s (%s);\n' \
-                    % (ctype(obj), qtypename, ls)
-            
-            out += '}\n\n'
-        elif method.get ('static', False):
-            out += 'LUABOT_EXPORT %s %s%s%s (%s) {\n' % \
-                (rt, obj['namespace'], typename, k, ps)
-            
-            if len(cbody) > 0:
-                out += '    ' + cbody + '\n'
-            elif not stub:
-                out += '    return %s::%s(%s);\n' \
-                    % (qtypename, k, ls)
-            
-            out += '}\n\n'
-        else:
-            out += 'LUABOT_EXPORT %s %s%s%s (%s) {\n' % \
-                (rt, obj['namespace'], typename, k, ps)
-            if len(cbody) > 0:
-                out +=  cbody + '\n'
-            elif not stub:
-                out += '    return ((%s*) self)->%s (%s);\n' \
-                    % (qtypename, k, ls)
-            
-            out += '}\n\n'
-    
-    out += '} // extern "C"\n' # extern C
+        method_t.render_into (methods, {
+            'RETURN': creturn (obj, method),
+            'SYMBOL': csymbol (obj, k),
+            'PARAMS': cparams (obj, method),
+            'BODY':   gen_ffi_impl_body (obj, k, method),
+        })
+
+    return template (obj, 'cpp_impl').render (
+        HEADER = obj['header'],
+        INCLUDES = ['#include <%s>\n' % h for h in includes],
+        LAYOUTS = layouts,
+        OPAQUE = '' if value_type else declare_opaque_ctype (obj),
+        FREE = csymbol (obj, 'Free') if has_destructor (obj) else '',
+        CTYPE = ctype (obj),
+        QTYPE = qualified_type (obj),
+        METHODS = methods)
+
+SYMBOLS_FILE = 'symbols.json'
+SYMBOLS_VERSION = 1
+
+def lua_type (obj, method, t, returned = False):
+    '''LuaLS annotation type for a YAML param or return type, None if void'''
+    if isinstance (t, dict):
+        return 'ffi.cdata*'
+    if t is None or t == 'void':
+        return None
+    if t in ('cptr', 'const-cptr'):
+        return obj['typename']
+    entry = registered_type (t)
+    if entry is not None:
+        return entry['typename']
+    if t == 'string':
+        # Only a lua_body turns the returned char* into a Lua string
+        has_body = len(method.get ('lua_body', '').strip()) > 0
+        return 'string' if has_body or not returned else 'ffi.cdata*'
+
+    base = t.strip()
+    if base.startswith ('const '):
+        base = base[6:].strip()
+    if base.replace (' ', '') == 'char*':
+        return 'string' if not returned else 'ffi.cdata*'
+    if '*' in base:
+        return 'ffi.cdata*'
+    if base == 'bool':
+        return 'boolean'
+    if base in ('float', 'double'):
+        return 'number'
+    if returned and base in ('int64_t', 'uint64_t', 'size_t'):
+        return 'ffi.cdata*'
+    return 'integer'
+
+def stub_functions (obj):
+    '''(name, sep, [(param, type)], return type) for each Lua function'''
+    out = []
+    methods = obj['methods']
+    if 'New' in methods:
+        ps = [(p, lua_type (obj, methods['New'], t)) \
+              for p, t in methods['New'].get ('params', {}).items()]
+        out.append (('new', '.', ps, obj['typename']))
+        if has_destructor (obj):
+            out.append (('release', ':', [], None))
+
+    for k, m in methods.items():
+        if m.get ('factory', False):
+            continue
+        ps = []
+        for p, t in m.get ('params', {}).items():
+            ps.append ((p, lua_type (obj, m, t)))
+            if isinstance (t, dict) and t.get ('array', False):
+                ps.append ((p + 'Length?', 'integer'))
+        out.append ((lowerfirst (k), '.' if m.get ('static', False) else ':', ps,
+                     lua_type (obj, m, m.get ('return_type'), True)))
     return out
 
+def gen_lua_stub (obj):
+    '''LuaLS definition file, annotations only, for editors to index.'''
+    fields = []
+    if is_value_type (obj):
+        for name, t, count in value_fields (obj):
+            lt = lua_type (obj, {}, t, True)
+            fields.append ('---@field %s %s\n' % (name, 'ffi.cdata*' if count > 0 else lt))
+    for name in obj.get ('structs', {}):
+        fields.append ('---@field %s fun(n: integer): ffi.cdata*\n' % name)
+
+    function_t = template (obj, 'lua_stub_function')
+    functions = []
+    for name, sep, ps, rt in stub_functions (obj):
+        notes = ['---@param %s %s\n' % (p, t) for p, t in ps]
+        if rt is not None:
+            notes.append ('---@return %s\n' % rt)
+        function_t.render_into (functions, {
+            'ANNOTATIONS': notes,
+            'TYPENAME':    obj['typename'],
+            'SEP':         sep,
+            'NAME':        name,
+            'PARAMS':      ', '.join (p.rstrip ('?') for p, _ in ps),
+        })
+
+    return template (obj, 'lua_stub').render (
+        TYPENAME = obj['typename'],
+        FIELDS = fields,
+        FUNCTIONS = functions)
+
+def gen_symbols (obj):
+    '''One class's entry in the JSON symbol index, lines refer to its stub'''
+    stub = gen_lua_stub (obj).splitlines()
+    def line_of (text):
+        for n, line in enumerate (stub):
+            if line.startswith (text):
+                return n + 1
+        return 0
+
+    name = obj['typename']
+    functions = {}
+    for fn, sep, ps, rt in stub_functions (obj):
+        functions[fn] = {
+            'static': sep == '.',
+            'params': [[p, t] for p, t in ps],
+            'returns': rt,
+            'line': line_of ('function %s%s%s(' % (name, sep, fn)),
+        }
+    return {
+        'typename': name,
+        'ctype': ctype (obj),
+        'value_type': bool (is_value_type (obj)),
+        'line': line_of ('---@class %s' % name),
+        'functions': functions,
+    }
+
+def gen_symbol_index (dir, files, entries):
+    '''Symbols of every class, keyed by module, so tools read one file'''
+    import json
+    modules = {}
+    for f, entry in sorted (zip (files, entries)):
+        module = yaml_module (dir, f)
+        if module is None or entry is None:
+            continue
+        entry = dict (entry)
+        entry['stub'] = module.replace ('.', '/') + '.d.lua'
+        modules[module] = entry
+    return json.dumps ({ 'version': SYMBOLS_VERSION, 'modules': modules },
+                       indent=1, sort_keys=True) + '\n'
+
 def find_resources (dir: str, types=['yaml', 'lua']) -> list[str]:
     from glob import glob
     from os.path import exists
@@ -296,33 +1298,169 @@ def find_resources (dir: str, types=['yaml', 'lua']) -> list[str]:
 def find_yaml_defs(dir: str) -> list[str]:
     return find_resources (dir, ['yaml'])
 
+def file_digest (path):
+    with open (path, 'rb') as f:
+        return hashlib.sha256 (f.read()).hexdigest()
+
+def write_output (output, txt):
+    """Write txt to output, leaving the file untouched if the content matches.
+
+    Unchanged outputs keep their mtime so the build doesn't recompile the
+    luabot-ffi sources that include them. Changed files are replaced
+    atomically. Returns True if the file was written.
+    """
+    if len(output) <= 0:
+        print(txt)
+        return False
+
+    data = txt.encode ('utf-8')
+    if os.path.isfile (output) and \
+            file_digest (output) == hashlib.sha256 (data).hexdigest():
+        return False
+
+    tmp = '%s.%d.tmp' % (output, os.getpid())
+    try:
+        with open (tmp, 'wb') as f:
+            f.write (data)
+        os.replace (tmp, output)
+    finally:
+        if os.path.exists (tmp):
+            os.remove (tmp)
+    return True
+
+GENERATORS = {
+    'lua':  gen_ffi_class,
+    'c':    gen_ffi_impl,
+    'cdef': gen_ffi_cdef,
+    'stubs': gen_lua_stub,
+    'symbols': gen_symbols,
+}
+
+def init_render_worker (cache, registry):
+    if len(cache) > 0:
+        load_class_def_cache (cache)
+    set_type_registry (registry)
+
+def render_def (file, formats):
+    """Parse a class definition once and render it in each of formats"""
+    obj = open_class_def (file)
+    check_type_refs (file, obj)
+    txts = [GENERATORS[fmt] (obj) for fmt in formats]
+    entry = None
+    if class_def_cache is not None:
+        entry = class_def_cache.get (os.path.abspath (file))
+    return txts, entry, class_def_symbols (obj)
+
+def copy_resource (src, dst):
+    import shutil
+    if os.path.exists (dst):
+        os.remove (dst)
+    shutil.copy2 (src, dst)
+
+def run_jobs (opts, renders, copies = []):
+    """Render class definitions and copy other resources.
+
+    renders is a list of (file, [(format, output), ...]) and copies a list
+    of (src, dst). An output of None is rendered but not written. With
+    -j N the YAML work runs in a process pool and the copies in a thread
+    pool. Outputs are written here in list order so the
+    result doesn't depend on scheduling, and errors are collected per file.
+    """
+    global class_def_cache_dirty
+    jobs = opts.jobs if opts.jobs > 0 else (os.cpu_count() or 1)
+    errors = []
+
+    def collect (file, fn, *args):
+        try:
+            return fn (*args)
+        except Exception as e:
+            errors.append ((file, e))
+            return None
+
+    if jobs <= 1:
+        rendered = [collect (f, render_def, f, [fmt for fmt, _ in outs])
+                    for f, outs in renders]
+        for src, dst in copies:
+            collect (src, copy_resource, src, dst)
+    else:
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        with ProcessPoolExecutor (max_workers=jobs,
+                                  initializer=init_render_worker,
+                                  initargs=(opts.cache, type_registry)) as pp, \
+             ThreadPoolExecutor (max_workers=jobs) as tp:
+            copied = [(src, tp.submit (copy_resource, src, dst))
+                      for src, dst in copies]
+            pending = [(f, pp.submit (render_def, f, [fmt for fmt, _ in outs]))
+                       for f, outs in renders]
+            rendered = [collect (f, fut.result) for f, fut in pending]
+            for src, fut in copied:
+                collect (src, fut.result)
+
+    # Symbols share one C namespace, so no two bindings may define the same
+    defined = {}
+    for (f, _), result in zip (renders, rendered):
+        for sym, (line, col) in (result[2] if result is not None else []):
+            if sym in defined:
+                errors.append ((f, BindingError (['%s:%d:%d: %s is already defined at %s:%d' \
+                    % (f, line, col, sym, defined[sym][0], defined[sym][1])])))
+            else:
+                defined[sym] = (f, line)
+    if len(errors) > 0:
+        rendered = [None] * len(rendered)
+
+    for (f, outs), result in zip (renders, rendered):
+        if result is None:
+            continue
+        txts, entry, _ = result
+        for (_, output), txt in zip (outs, txts):
+            if output is not None:
+                collect (f, write_output, output, txt)
+
+        key = os.path.abspath (f)
+        if entry is not None and class_def_cache is not None and \
+                class_def_cache.get (key, (None,))[0] != entry[0]:
+            class_def_cache[key] = entry
+            class_def_cache_dirty = True
+
+    if len(errors) > 0:
+        import sys
+        errors.sort (key=lambda e: e[0])
+        for f, e in errors:
+            if isinstance (e, BindingError):
+                print (e, file=sys.stderr)
+            else:
+                print ('%s: %s' % (f, e), file=sys.stderr)
+        failed = '%d file(s) failed to generate' % len(set (f for f, _ in errors))
+        if all (isinstance (e, BindingError) for _, e in errors):
+            raise BindingError ([failed])
+        raise Exception (failed)
+
+    return rendered
+
+def load_type_registry (dir, defs):
+    """Register every YAML under dir, plus defs given from elsewhere"""
+    files = find_yaml_defs (dir) if os.path.isdir (dir) else []
+    files += [f for f in defs if os.path.splitext (f)[1] in ('.yaml', '.yml')]
+    set_type_registry (build_type_registry (dir, set (os.path.abspath (f) for f in files)))
+
 def process (opts, file, output = ''):
+    if opts.format == 'lua':
+        # The class requires FFI_DECLS_MODULE, built from every binding's cdef
+        raise Exception ("-f lua needs a directory or --batch: a single class requires %s, "
+                         "which only those write" % FFI_DECLS_MODULE)
+    load_type_registry (os.path.abspath (opts.bindings_dir), [file])
     obj = open_class_def (file)
-    if opts.format != 'lua':
-        txt = gen_ffi_impl (obj)
-        if len(output) > 0:
-            with open (output, 'w') as f:
-                f.write (txt)
-                f.close()
-        else:
-            print(txt)
+    check_type_refs (file, obj)
+    if opts.format == 'stubs':
+        write_output (output, gen_lua_stub (obj))
     else:
-        txt = gen_ffi_class (obj)
-        if len(output) > 0:
-            with open (output, 'w') as f:
-                f.write (txt)
-                f.close()
-        else:
-            print(txt)
+        write_output (output, gen_ffi_impl (obj))
 
 def renderall (opts, defs = []):
     dir = os.path.abspath (opts.bindings_dir)
     have_output = len(opts.output) > 0
     tgt = os.path.abspath (opts.output)
 
-    # print ('DIR:', dir)
-    # print()
-
     if os.path.exists (tgt) and not os.path.isdir (tgt):
         raise NotADirectoryError (tgt)
     if not os.path.exists (tgt):
@@ -330,14 +1468,17 @@ def renderall (opts, defs = []):
     
     if len(defs) <= 0:
         defs = find_yaml_defs (dir)
+    if opts.format not in GENERATORS:
+        raise Exception("Invalid output format: " + opts.format)
+    load_type_registry (dir, defs)
 
+    renders = []
+    copies = []
     if not have_output:
         for f in defs:
-            af = os.path.abspath (f)
-            process (opts, af)
+            renders.append ((os.path.abspath (f), [(opts.format, '')]))
     else:
         for f in defs:
-            # print (' -', f)
             af = os.path.abspath (f)
             stem, ext = os.path.splitext (af)
 
@@ -352,28 +1493,101 @@ def renderall (opts, defs = []):
                     fn = fn.replace('yaml', 'lua')
                 elif opts.format == 'c':
                     fn = fn.replace('yaml', 'cpp')
-                else:
-                    raise Exception("Invalid output format: " + opts.format)
+                elif opts.format == 'stubs':
+                    fn = fn.replace('yaml', 'd.lua')
             
             nd = os.path.dirname (os.path.join (tgt, nd))
             nf = os.path.join (nd, fn)
 
-            # print (f)
-            # print (af)
-            # print (nd)
-            # print ('->', nf)
-            # print()
-            # continue
-
             if not os.path.exists (nd):
                 os.makedirs (nd)
             if should_process:
-                process (opts, af, nf)
+                outs = [(opts.format, nf)]
+                if opts.format == 'lua':
+                    outs.append (('cdef', None))
+                elif opts.format == 'stubs':
+                    outs.append (('symbols', None))
+                renders.append ((af, outs))
             else:
-                import shutil
-                if os.path.exists (nf):
-                    os.remove (nf)
-                shutil.copy2 (af, nf)
+                copies.append ((af, nf))
+
+    rendered = run_jobs (opts, renders, copies)
+    if have_output and opts.format == 'lua' and len(renders) > 0:
+        nf = ffi_decls_path (tgt)
+        os.makedirs (os.path.dirname (nf), exist_ok=True)
+        write_output (nf, gen_ffi_decls ([r[0][-1] for r in rendered]))
+    if have_output and opts.format == 'stubs' and len(renders) > 0:
+        write_output (os.path.join (tgt, SYMBOLS_FILE),
+                      gen_symbol_index (dir, [f for f, _ in renders],
+                                        [r[0][-1] for r in rendered]))
+
+def depfile_escape (path: str):
+    return path.replace ('\\', '/').replace (' ', '\\ ')
+
+def write_depfile (depfile, target, deps):
+    """Write a Makefile style depfile understood by Ninja and CMake's DEPFILE"""
+    out = depfile_escape (target) + ':'
+    for d in deps:
+        out += ' \\\n  ' + depfile_escape (d)
+    with open (depfile, 'w') as f:
+        f.write (out + '\n')
+
+def renderbatch (opts, defs = []):
+    """Generate Lua and C++ for each YAML, parsing each file only once.
+
+    Outputs mirror the CMake build tree: OUT/lua/<rel>.lua and
+    OUT/include/luabot/ffi/<rel>.cpp unless --lua-dir/--cpp-dir are given.
+    """
+    dir = os.path.abspath (opts.bindings_dir)
+    if len(defs) == 1 and os.path.isdir (defs[0]):
+        dir = os.path.abspath (defs[0])
+        defs = []
+    if len(defs) <= 0:
+        defs = find_yaml_defs (dir)
+
+    lua_dir = opts.lua_dir
+    cpp_dir = opts.cpp_dir
+    if len(opts.output) > 0:
+        if len(lua_dir) <= 0:
+            lua_dir = os.path.join (opts.output, 'lua')
+        if len(cpp_dir) <= 0:
+            cpp_dir = os.path.join (opts.output, 'include', 'luabot', 'ffi')
+    if len(lua_dir) <= 0 or len(cpp_dir) <= 0:
+        raise Exception ("Batch mode needs -o or both --lua-dir and --cpp-dir")
+
+    lua_dir = os.path.abspath (lua_dir)
+    cpp_dir = os.path.abspath (cpp_dir)
+
+    inputs = sorted (os.path.abspath (f) for f in defs)
+    load_type_registry (dir, inputs)
+    outputs = []
+    renders = []
+    for f in inputs:
+        stem = os.path.splitext (os.path.relpath (f, dir))[0]
+        outs = []
+        for root, ext, fmt in [(lua_dir, '.lua', 'lua'), (cpp_dir, '.cpp', 'c')]:
+            nf = os.path.join (root, stem + ext)
+            os.makedirs (os.path.dirname (nf), exist_ok=True)
+            outs.append ((fmt, nf))
+            outputs.append (nf)
+        outs.append (('cdef', None))
+        renders.append ((f, outs))
+
+    rendered = run_jobs (opts, renders)
+    nf = ffi_decls_path (lua_dir)
+    os.makedirs (os.path.dirname (nf), exist_ok=True)
+    write_output (nf, gen_ffi_decls ([r[0][-1] for r in rendered]))
+    outputs.append (nf)
+
+    if len(opts.stamp) > 0:
+        with open (opts.stamp, 'w') as f:
+            f.write ('\n'.join (outputs) + '\n')
+    target = opts.stamp if len(opts.stamp) > 0 else ''
+    if len(target) <= 0 and len(outputs) > 0:
+        target = outputs[0]
+    if len(opts.depfile) > 0 and len(target) > 0:
+        write_depfile (opts.depfile, target,
+                       [os.path.abspath (__file__)] + inputs)
 
 def print_modules (dir):
     from pathlib import Path
@@ -395,6 +1609,8 @@ def print_modules (dir):
 
 def main():
     opts, args = parse_options()
+    if len(opts.cache) > 0:
+        load_class_def_cache (opts.cache)
     if (opts.list):
         d = args[0] if len(args) > 0 else opts.bindings_dir
         if not os.path.isdir (d):
@@ -409,7 +1625,21 @@ def main():
             print (f)
         exit(0)
 
-    if len(args) == 1:
+    try:
+        dispatch (opts, args)
+    except BindingError as e:
+        import sys
+        print (e, file=sys.stderr)
+        exit(1)
+
+    if len(opts.cache) > 0:
+        save_class_def_cache (opts.cache)
+    exit(0)
+
+def dispatch (opts, args):
+    if opts.batch:
+        renderbatch (opts, args)
+    elif len(args) == 1:
         if os.path.isdir(args[0]):
             renderall (opts)
         else:
@@ -421,7 +1651,5 @@ def main():
     else:
         raise Exception()
 
-    exit(0)
-
 if __name__ == '__main__':    
     main()
@@ -1,58 +1,256 @@
 # SPDX-FileCopyrightText: Michael Fisher @mfisher31
 # SPDX-License-Identifier: MIT
 
-import os,time
-from pathlib import Path
+"""Regenerate only what a change under bindings/ affects.
+
+Events are queued and coalesced until the tree has been quiet for a
+moment, so an editor's save storm costs one pass. YAML is rendered in
+process with parse.py, hand written .lua is copied to build/lua, and Ninja
+only runs when C++ changed.
+"""
+
+import argparse
+import os
+import queue
+import sys
+import time
+from subprocess import call
 
 from watchdog.observers import Observer
 from watchdog.events import PatternMatchingEventHandler
-from subprocess import call
 
-def touch_meson_build():
-    Path('meson.build').touch()
-    call('meson compile -C build'.split())
-    print ("[watch] Meson rebuild done!")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import parse
 
-def on_created(event):
-    print(f"[watch] created: {event.src_path}")
-    touch_meson_build()
+PATTERNS = ["*.yaml", "*.yml", "*.lua", "*.cpp"]
+YAML_EXTENSIONS = ('.yaml', '.yml')
 
-def on_deleted(event):
-    print(f"[watch] deleted: {event.src_path}!")
-    touch_meson_build()
+class Bindings:
+    """The bindings tree and where its outputs go in the build directory.
 
-def on_modified(event):
-    print(f"[watch] changed: {event.src_path}")
-    touch_meson_build()
+    Keeps each YAML's cdef and the classes it references, so a change
+    rewrites one class, the classes using it and ffi_decls.lua.
+    """
+    def __init__(self, src, build, target):
+        self.src = os.path.abspath(src)
+        self.build = os.path.abspath(build)
+        self.target = target
+        self.lua_dir = os.path.join(self.build, 'lua')
+        self.cpp_dir = os.path.join(self.build, 'include', 'luabot', 'ffi')
+        # Written by parse.py --batch for the generate_bindings command
+        self.stamp = os.path.join(self.build, 'bindings', 'bindings.stamp')
+        self.depfile = os.path.join(self.build, 'bindings', 'bindings.d')
+        self.cdefs = {}
+        self.types = {}
+        self.uses = {}
 
-def on_moved(event):
-    print(f"[watch] moved: {event.src_path} -> {event.dest_path}")
-    touch_meson_build()
+    def output(self, path, root, ext=None):
+        rel = os.path.relpath(path, self.src)
+        if ext is not None:
+            rel = os.path.splitext(rel)[0] + ext
+        return os.path.join(root, rel)
 
-if __name__ == "__main__":
-    patterns = ["*.*"]
-    ignore_patterns = None
-    ignore_directories = False
-    case_sensitive = True
+    def render(self, path):
+        """Write a YAML's Lua and C++, returns True if the C++ changed"""
+        obj = parse.open_class_def(path)
+        parse.check_type_refs(path, obj)
+        lua = self.output(path, self.lua_dir, '.lua')
+        cpp = self.output(path, self.cpp_dir, '.cpp')
+        for out in (lua, cpp):
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+
+        parse.write_output(lua, parse.gen_ffi_class(obj))
+        changed = parse.write_output(cpp, parse.gen_ffi_impl(obj))
+        self.cdefs[path] = parse.gen_ffi_cdef(obj)
+        self.types[path] = obj['typename']
+        self.uses[path] = {e['typename'] for e in parse.referenced_types(obj)}
+        return changed
+
+    def write_decls(self):
+        nf = parse.ffi_decls_path(self.lua_dir)
+        os.makedirs(os.path.dirname(nf), exist_ok=True)
+        parse.write_output(nf, parse.gen_ffi_decls([self.cdefs[f] for f in sorted(self.cdefs)]))
+
+    def mark_built(self):
+        """Record the batch command as up to date, like parse.py --batch does.
+
+        Ninja reruns the batch when any of its outputs is older than a YAML,
+        and write_output leaves unchanged files alone, so touch every output
+        and then rewrite the stamp and depfile.
+        """
+        if not os.path.isdir(os.path.dirname(self.stamp)):
+            return
+        defs = sorted(os.path.abspath(f) for f in parse.find_yaml_defs(self.src))
+        outputs = []
+        for f in defs:
+            outputs += [self.output(f, self.lua_dir, '.lua'), self.output(f, self.cpp_dir, '.cpp')]
+        outputs.append(parse.ffi_decls_path(self.lua_dir))
+        for out in outputs:
+            if os.path.exists(out):
+                os.utime(out)
+        with open(self.stamp, 'w') as f:
+            f.write('\n'.join(outputs) + '\n')
+        parse.write_depfile(self.depfile, self.stamp, [os.path.abspath(parse.__file__)] + defs)
+
+    def render_yaml(self, paths):
+        """Render paths and every class using a type they define"""
+        parse.load_type_registry(self.src, [])
+        changed_types = {self.types[p] for p in paths if p in self.types}
+        for p in paths:
+            try:
+                changed_types.add(parse.open_class_def(p)['typename'])
+            except (OSError, parse.BindingError):
+                pass
+
+        todo = set(p for p in paths if os.path.exists(p))
+        todo |= {f for f, uses in self.uses.items() if uses & changed_types}
+
+        cpp_changed = False
+        failed = False
+        for p in sorted(todo):
+            try:
+                cpp_changed = self.render(p) or cpp_changed
+                print(f"[watch] rendered {os.path.relpath(p, self.src)}")
+            except parse.BindingError as e:
+                print(e, file=sys.stderr)
+                failed = True
+        self.write_decls()
+        # Leave the batch stale after an error, so Ninja reports it too
+        if not failed:
+            self.mark_built()
+        return cpp_changed
 
-    my_event_handler = PatternMatchingEventHandler(patterns, ignore_patterns, ignore_directories, case_sensitive)
-    my_event_handler.on_created = on_created
-    my_event_handler.on_deleted = on_deleted
-    my_event_handler.on_modified = on_modified
-    my_event_handler.on_moved = on_moved
+    def load(self):
+        """Render everything once, so cdefs and uses are known"""
+        parse.load_type_registry(self.src, [])
+        failed = False
+        for f in sorted(os.path.abspath(f) for f in parse.find_yaml_defs(self.src)):
+            try:
+                self.render(f)
+            except parse.BindingError as e:
+                print(e, file=sys.stderr)
+                failed = True
+        self.write_decls()
+        if not failed:
+            self.mark_built()
 
-    path = os.path.abspath('bindings')
-    go_recursively = True
+    def remove(self, *outputs):
+        for out in outputs:
+            if os.path.exists(out):
+                os.remove(out)
 
-    my_observer = Observer()
-    my_observer.schedule(my_event_handler, path, recursive=go_recursively)
-    my_observer.start()
+    def update(self, paths):
+        """Bring the build tree up to date, returns the Ninja targets to run"""
+        yaml = set()
+        reconfigure = False
+        cpp_changed = False
 
-    print ("Watching bindings directory for changes")
+        for p in sorted(paths):
+            ext = os.path.splitext(p)[1]
+            exists = os.path.exists(p)
+            if ext in YAML_EXTENSIONS:
+                reconfigure = reconfigure or exists != (p in self.cdefs)
+                if not exists:
+                    self.remove(self.output(p, self.lua_dir, '.lua'),
+                                self.output(p, self.cpp_dir, '.cpp'))
+                    self.cdefs.pop(p, None)
+                    self.uses.pop(p, None)
+                yaml.add(p)
+            elif ext == '.lua':
+                out = self.output(p, self.lua_dir)
+                if exists:
+                    os.makedirs(os.path.dirname(out), exist_ok=True)
+                    parse.copy_resource(p, out)
+                    print(f"[watch] copied {os.path.relpath(p, self.src)}")
+                else:
+                    self.remove(out)
+            elif ext == '.cpp':
+                out = self.output(p, self.cpp_dir)
+                reconfigure = reconfigure or exists != os.path.exists(out)
+                if exists:
+                    os.makedirs(os.path.dirname(out), exist_ok=True)
+                    parse.copy_resource(p, out)
+                else:
+                    self.remove(out)
+                cpp_changed = True
+
+        if len(yaml) > 0:
+            cpp_changed = self.render_yaml(yaml) or cpp_changed
+            for p in yaml:
+                if not os.path.exists(p):
+                    self.types.pop(p, None)
+
+        # Generated .ipp include lists are fixed when CMake configures
+        if reconfigure:
+            return ['rebuild_cache', self.target]
+        return [self.target] if cpp_changed else []
+
+class Handler(PatternMatchingEventHandler):
+    def __init__(self, events):
+        super().__init__(patterns=PATTERNS, ignore_directories=True, case_sensitive=True)
+        self.events = events
+
+    def on_any_event(self, event):
+        if event.event_type not in ('created', 'deleted', 'modified', 'moved'):
+            return
+        self.events.put(os.path.abspath(event.src_path))
+        if event.event_type == 'moved':
+            self.events.put(os.path.abspath(event.dest_path))
+
+def coalesce(events, debounce):
+    """Block for one event, then gather more until debounce seconds pass quietly"""
+    paths = set()
+    while len(paths) <= 0:
+        try:
+            paths.add(events.get(timeout=0.5))
+        except queue.Empty:
+            pass
+    while True:
+        try:
+            paths.add(events.get(timeout=debounce))
+        except queue.Empty:
+            return paths
+
+def ninja(build, targets):
+    for target in targets:
+        if call(['ninja', '-C', build, target]) != 0:
+            print(f"[watch] ninja {target} failed")
+            return False
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description='Regenerate bindings as they change')
+    parser.add_argument('--bindings', default='bindings', help='Bindings source directory (default: bindings)')
+    parser.add_argument('--build', default='build', help='CMake build directory (default: build)')
+    parser.add_argument('--target', default='luabot', help='Ninja target to build when C++ changes (default: luabot)')
+    parser.add_argument('--debounce', type=float, default=0.15, help='Seconds of quiet before rebuilding (default: 0.15)')
+    parser.add_argument('--cache', default='', help='parse.py class definition cache (default: BUILD/bindings/bindings.cache)')
+    args = parser.parse_args()
+
+    cache = args.cache or os.path.join(args.build, 'bindings', 'bindings.cache')
+    parse.load_class_def_cache(cache)
+    bindings = Bindings(args.bindings, args.build, args.target)
+    bindings.load()
+
+    events = queue.Queue()
+    observer = Observer()
+    observer.schedule(Handler(events), bindings.src, recursive=True)
+    observer.start()
+
+    print(f"[watch] watching {bindings.src}")
     try:
         while True:
-            time.sleep(1)
+            paths = coalesce(events, args.debounce)
+            start = time.perf_counter()
+            targets = bindings.update(paths)
+            ok = ninja(bindings.build, targets)
+            parse.save_class_def_cache(cache)
+            elapsed = (time.perf_counter() - start) * 1000.0
+            built = f", built {' '.join(targets)}" if len(targets) > 0 and ok else ''
+            print(f"[watch] {len(paths)} change(s) in {elapsed:.0f} ms{built}")
     except KeyboardInterrupt:
-        my_observer.stop()
-        my_observer.join()
+        observer.stop()
+        observer.join()
 
+if __name__ == "__main__":
+    main()
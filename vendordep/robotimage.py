@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: Michael Fisher @mfisher31
+# SPDX-License-Identifier: MIT
+
+"""Pack a robot and every module it requires into one image file.
+
+luabot loads an image (see luabot_loadimage in luabot.h) with a single
+read and resolves require from its index, instead of probing each
+package.path entry per module at boot.
+
+Layout, integers are little endian uint32:
+
+    header   'LUABOTIM' version count
+    index    count x (name offset, name length, chunk offset, chunk length)
+    names    module names, not terminated
+    chunks   Lua source or LuaJIT bytecode
+
+Entry 0 is the robot file itself, the rest are modules sorted by name.
+
+With --bytecode every chunk is checked against the --target platform's
+bytecode format, like the bundle vendordep.py packages.
+"""
+
+import os
+import re
+import struct
+import subprocess
+import sys
+import tempfile
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import vendordep
+
+IMAGE_MAGIC = b'LUABOTIM'
+IMAGE_VERSION = 1
+IMAGE_EXT = '.luabot'
+HEADER = struct.Struct('<8sII')
+ENTRY = struct.Struct('<IIII')
+
+DEFAULT_PATH = 'build/lua/?.lua;build/lua/?/init.lua'
+
+# Built into LuaJIT or preloaded by luaL_openlibs, never on package.path
+BUILTIN_MODULES = {
+    'bit', 'coroutine', 'debug', 'ffi', 'io', 'jit', 'math', 'os',
+    'package', 'string', 'table'
+}
+
+REQUIRE_CALL = re.compile(r'''\brequire\s*\(?\s*(['"])([\w.\-]+)\1''')
+# Modules required later through a list, like the geometry classes' requires = {...}
+REQUIRES_LIST = re.compile(r'\brequires\s*=\s*\{([^}]*)\}')
+STRING = re.compile(r'''(['"])([\w.\-]+)\1''')
+
+def required_modules(source):
+    """Module names a chunk requires with a literal name"""
+    names = [m.group(2) for m in REQUIRE_CALL.finditer(source)]
+    for block in REQUIRES_LIST.finditer(source):
+        names += [m.group(2) for m in STRING.finditer(block.group(1))]
+    return names
+
+def search_path(name, path):
+    """First file on a LUA_PATH style template matching name, like package.searchpath"""
+    rel = name.replace('.', '/')
+    for template in path.split(';'):
+        if len(template) <= 0:
+            continue
+        candidate = Path(template.replace('?', rel))
+        if candidate.is_file():
+            return candidate
+    return None
+
+def resolve(entry, path, extra=()):
+    """(modules, missing) reached from entry; modules maps name to file"""
+    modules = {}
+    missing = set()
+    pending = list(extra) + required_modules(entry.read_text())
+    while len(pending) > 0:
+        name = pending.pop()
+        if name in modules or name in missing:
+            continue
+        if name in BUILTIN_MODULES or name.split('.')[0] == 'jit':
+            continue
+        file_path = search_path(name, path)
+        if file_path is None:
+            missing.add(name)
+            continue
+        modules[name] = file_path
+        pending += required_modules(file_path.read_text())
+    return modules, missing
+
+def load_source(file_path):
+    src = file_path.read_bytes()
+    if src.startswith(b'#'):
+        # luaL_loadbuffer doesn't skip a shebang line like luaL_loadfile
+        src = b'--' + src
+    return src
+
+def compile_chunk(luajit, file_path, debug, target):
+    """LuaJIT bytecode of one file for target, stripped unless debug"""
+    with tempfile.TemporaryDirectory() as tmp:
+        out = Path(tmp) / 'chunk.bc'
+        strip = '-g' if debug else '-s'
+        subprocess.run([luajit, '-b', strip, '-t', 'raw', str(file_path), str(out)], check=True)
+        bytecode = out.read_bytes()
+    try:
+        vendordep.check_bytecode(bytecode, target)
+    except ValueError as e:
+        raise ValueError(f"{file_path}: {e}") from None
+    return bytecode
+
+def image_bytes(chunks):
+    """Serialize (name, chunk) pairs, entry first, into an image"""
+    names = [name.encode() for name, _ in chunks]
+    offset = HEADER.size + ENTRY.size * len(chunks)
+    index = []
+    name_offsets = []
+    for name in names:
+        name_offsets.append(offset)
+        offset += len(name)
+    for (_, chunk), name, name_offset in zip(chunks, names, name_offsets):
+        index.append(ENTRY.pack(name_offset, len(name), offset, len(chunk)))
+        offset += len(chunk)
+
+    out = [HEADER.pack(IMAGE_MAGIC, IMAGE_VERSION, len(chunks))]
+    out += index
+    out += names
+    out += [chunk for _, chunk in chunks]
+    return b''.join(out)
+
+def write_image(output, data):
+    """Atomically replace output, returns False when it already held data"""
+    output = Path(output)
+    if output.is_file() and output.read_bytes() == data:
+        return False
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_name(f"{output.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, output)
+    return True
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Bundle a robot and the Lua modules it requires into one image')
+    parser.add_argument('entry', help='Robot Lua file, the module returning the robot class')
+    parser.add_argument('-o', '--output', default='', help=f'Image file (default: ENTRY with {IMAGE_EXT})')
+    parser.add_argument('--path', default='', help=f'LUA_PATH style module search path (default: ENTRY dir, then $LUA_PATH or {DEFAULT_PATH})')
+    parser.add_argument('-m', '--module', action='append', default=[], help='Also bundle a module only required with a computed name, may repeat')
+    parser.add_argument('--bytecode', action='store_true', help='Store LuaJIT bytecode instead of source')
+    parser.add_argument('--luajit', default='luajit', help='LuaJIT used by --bytecode, it must produce bytecode for --target (default: luajit)')
+    parser.add_argument('--target', default='linuxathena', choices=sorted(vendordep.BYTECODE_FR2), help='Platform the --bytecode image is for (default: linuxathena)')
+    parser.add_argument('-g', '--debug', action='store_true', help='Keep debug info in bytecode, for line numbers in errors')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='Threads used to compile bytecode (default: one per CPU)')
+    args = parser.parse_args()
+
+    entry = Path(args.entry)
+    path = args.path
+    if len(path) <= 0:
+        entry_dir = entry.parent.as_posix() or '.'
+        path = f'{entry_dir}/?.lua;{entry_dir}/?/init.lua;' + (os.environ.get('LUA_PATH') or DEFAULT_PATH)
+
+    modules, missing = resolve(entry, path, args.module)
+    for name in sorted(missing):
+        print(f"warning: module '{name}' not found on the search path, it will load from package.path")
+
+    # Entry first, then modules sorted by name so luabot can binary search
+    files = [(entry.stem, entry)] + sorted(modules.items())
+    if args.bytecode:
+        with ThreadPool(args.jobs if args.jobs > 0 else None) as pool:
+            data = pool.map(lambda f: compile_chunk(args.luajit, f[1], args.debug, args.target), files)
+    else:
+        data = [load_source(f) for _, f in files]
+
+    output = args.output or str(entry.with_suffix(IMAGE_EXT))
+    image = image_bytes([(name, chunk) for (name, _), chunk in zip(files, data)])
+    if write_image(output, image):
+        print(f"Created {output} ({len(modules)} modules, {len(image)} bytes)")
+    else:
+        print(f"Up to date {output}")
+    return 0
+
+if __name__ == '__main__':
+    exit(main())
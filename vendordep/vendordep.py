@@ -2,9 +2,16 @@
 # SPDX-FileCopyrightText: Michael Fisher @mfisher31
 # SPDX-License-Identifier: MIT
 
+import functools
+import hashlib
+import json
 import os
 import platform
+import shutil
+import struct
+import time
 import zipfile
+import zlib
 from pathlib import Path
 
 LUAJIT_VERSION = '2.1'
@@ -53,7 +60,254 @@ def artifact_platform(plat:str):
 def platform_is_build(platform:str):
     return platform.strip() == frc_platform()
 
-def create_luajit_headers(version, output_dir):
+# Zips are reproducible: entries sorted, one timestamp, normalized modes
+# and a fixed compression level, so unchanged inputs give identical bytes.
+COMPRESSION_LEVEL = 6
+DEFAULT_EPOCH = 315532800  # 1980-01-01, the earliest zip timestamp
+
+def source_date_epoch():
+    """Timestamp for every zip entry, from SOURCE_DATE_EPOCH if set"""
+    return int(os.environ.get('SOURCE_DATE_EPOCH', DEFAULT_EPOCH))
+
+class Member:
+    """A file deflated once, ready to be stored in any number of zips"""
+    __slots__ = ('data', 'crc', 'size', 'mode')
+
+    def __init__(self, raw, mode):
+        compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, -15)
+        self.data = compressor.compress(raw) + compressor.flush()
+        self.crc = zlib.crc32(raw)
+        self.size = len(raw)
+        self.mode = mode
+
+def entry_mode(source):
+    """Normalized zip mode of a file path or bytes payload, 0755 if executable"""
+    if isinstance(source, bytes) or not os.stat(source).st_mode & 0o111:
+        return 0o644
+    return 0o755
+
+def compress(source):
+    """Deflate a file path or a bytes payload into a Member"""
+    if isinstance(source, bytes):
+        return Member(source, entry_mode(source))
+    with open(source, 'rb') as f:
+        return Member(f.read(), entry_mode(source))
+
+def dos_time(timestamp):
+    t = time.gmtime(timestamp)
+    if t.tm_year < 1980:
+        t = time.gmtime(DEFAULT_EPOCH)
+    return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+            (min(t.tm_year - 1980, 127) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+def write_atomic(path, content):
+    """Write str or bytes to path through a temporary file and os.replace.
+
+    Installs may hardlink path, replacing it leaves them the old content
+    instead of rewriting the shared inode in place.
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb' if isinstance(content, bytes) else 'w') as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+def write_zip(zip_path, members, epoch):
+    """Write (arcname, Member) pairs as a deflated zip, no recompression.
+
+    The zip is replaced atomically, so hardlinked installs of the previous
+    one keep their content.
+    """
+    central = []
+    offset = 0
+    tmp = f"{zip_path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        for arcname, m in members:
+            name = str(arcname).replace(os.sep, '/').encode('utf-8')
+            if offset + len(m.data) >= 0xFFFFFFFF or m.size >= 0xFFFFFFFF:
+                raise ValueError(f"{zip_path}: {arcname} needs ZIP64, which is not supported")
+            flags = 0 if name.isascii() else 0x800
+            mtime, mdate = dos_time(epoch)
+            f.write(struct.pack('<IHHHHHIIIHH', 0x04034b50, 20, flags, zipfile.ZIP_DEFLATED,
+                                mtime, mdate, m.crc, len(m.data), m.size, len(name), 0))
+            f.write(name)
+            f.write(m.data)
+            central.append(struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, (3 << 8) | 20, 20,
+                                       flags, zipfile.ZIP_DEFLATED, mtime, mdate, m.crc,
+                                       len(m.data), m.size, len(name), 0, 0, 0, 0,
+                                       (0o100000 | m.mode) << 16, offset) + name)
+            offset += 30 + len(name) + len(m.data)
+
+        directory = b''.join(central)
+        f.write(directory)
+        f.write(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, len(central), len(central),
+                            len(directory), offset, 0))
+    os.replace(tmp, zip_path)
+    return zip_path
+
+MANIFEST_NAME = '.vendordep-manifest.json'
+
+def file_digest(path, algorithms=('sha256',)):
+    """Hex digest of path, or a tuple of them if several algorithms are asked for"""
+    hs = [hashlib.new(a) for a in algorithms]
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            for h in hs:
+                h.update(block)
+    out = tuple(h.hexdigest() for h in hs)
+    return out[0] if len(out) == 1 else out
+
+CHECKSUMS = ('sha256', 'md5')
+
+def write_checksums(path, force=False):
+    """Maven style .sha256/.md5 sidecars holding just the hex digest, returns the sha256"""
+    path = Path(path)
+    sidecars = [path.with_name(f"{path.name}.{a}") for a in CHECKSUMS]
+    if not force and all(p.exists() for p in sidecars):
+        return None
+    digests = file_digest(path, CHECKSUMS)
+    for sidecar, digest in zip(sidecars, digests):
+        write_atomic(sidecar, digest + '\n')
+    return digests[0]
+
+def stat_key(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+class Manifest:
+    """Hashes of each artifact's inputs and output, kept as JSON next to them.
+
+    Input files are hashed by content, with size and mtime remembered so an
+    untouched file is not read again. An artifact is up to date when its
+    inputs have the same names, hashes and modes and its zip is still the
+    one that was written.
+    """
+    VERSION = 3
+
+    def __init__(self, path, fresh=False):
+        self.path = Path(path) if path else None
+        self.files = {}
+        self.artifacts = {}
+        # Zips written with other settings are not reused
+        self.settings = {'epoch': source_date_epoch(), 'level': COMPRESSION_LEVEL}
+        if fresh or self.path is None or not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == self.VERSION:
+            self.files = data.get('files', {})
+            if data.get('settings') == self.settings:
+                self.artifacts = data.get('artifacts', {})
+
+    def digest(self, source):
+        """sha256 of a file path or bytes payload"""
+        if isinstance(source, bytes):
+            return hashlib.sha256(source).hexdigest()
+        key = os.path.abspath(source)
+        st = stat_key(source)
+        cached = self.files.get(key)
+        if cached is not None and cached[:2] == st:
+            return cached[2]
+        digest = file_digest(source)
+        self.files[key] = st + [digest]
+        return digest
+
+    def up_to_date(self, zip_path, inputs):
+        record = self.artifacts.get(Path(zip_path).name)
+        if record is None or record['inputs'] != inputs or not Path(zip_path).exists():
+            return False
+        return record['stat'] == stat_key(zip_path)
+
+    def record(self, zip_path, inputs, sha256):
+        self.artifacts[Path(zip_path).name] = {
+            'inputs': inputs,
+            'sha256': sha256,
+            'stat': stat_key(zip_path),
+        }
+
+    def sha256(self, file_path):
+        """Recorded hash of an artifact, if the file is unchanged since"""
+        record = self.artifacts.get(Path(file_path).name)
+        if record is not None and record['stat'] == stat_key(file_path):
+            return record['sha256']
+        return None
+
+    def save(self):
+        if self.path is None:
+            return
+        for key in [k for k in self.files if not os.path.exists(k)]:
+            del self.files[key]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        write_atomic(self.path, json.dumps({'version': self.VERSION, 'settings': self.settings,
+                                            'files': self.files, 'artifacts': self.artifacts},
+                                           indent=1, sort_keys=True))
+
+class Packager:
+    """Collects archives, then compresses and writes them on a thread pool.
+
+    Each input is read and deflated once however many archives include it,
+    so a release zip and its debug twin share one compressed library. zlib
+    releases the GIL, so both steps scale with the number of threads.
+    Archives whose inputs match the manifest are skipped.
+    """
+    def __init__(self, jobs=0, manifest=None):
+        self.jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        self.manifest = manifest if manifest is not None else Manifest(None)
+        self.archives = []
+
+    def add(self, zip_path, entries):
+        """Queue zip_path with entries of (arcname, Path or bytes), stored sorted"""
+        entries = sorted(((str(name).replace(os.sep, '/'), src) for name, src in entries),
+                         key=lambda e: e[0])
+        self.archives.append((Path(zip_path), entries))
+        return Path(zip_path)
+
+    def run(self):
+        from concurrent.futures import ThreadPoolExecutor
+        sources = list(dict.fromkeys(src for _, entries in self.archives for _, src in entries))
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            digests = dict(zip(sources, pool.map(self.manifest.digest, sources)))
+            stale = []
+            for zip_path, entries in self.archives:
+                inputs = [[name, digests[src], entry_mode(src)] for name, src in entries]
+                if self.manifest.up_to_date(zip_path, inputs):
+                    write_checksums(zip_path)
+                    print(f"Up to date {zip_path}")
+                else:
+                    stale.append((zip_path, entries, inputs))
+
+            sources = list(dict.fromkeys(src for _, entries, _ in stale for _, src in entries))
+            members = dict(zip(sources, pool.map(compress, sources)))
+            epoch = self.manifest.settings['epoch']
+            written = pool.map(lambda a: write_zip(a[0], [(n, members[src]) for n, src in a[1]], epoch),
+                               stale)
+            for (zip_path, _, inputs), _ in zip(stale, written):
+                self.manifest.record(zip_path, inputs, write_checksums(zip_path, force=True))
+                print(f"Created {zip_path}")
+        self.manifest.save()
+        self.archives = []
+
+@functools.lru_cache(maxsize=None)
+def scan_tree(root):
+    """Files under root as sorted (Path, relative path) pairs, walked once per root"""
+    root = Path(root)
+    out = []
+    for dirpath, dirs, files in os.walk(root):
+        for file in files:
+            file_path = Path(dirpath) / file
+            out.append((file_path, file_path.relative_to(root).as_posix()))
+    return tuple(sorted(out, key=lambda e: e[1]))
+
+def find_library(lib_dir, name):
+    """First *.a or *.lib under lib_dir with name in its file name"""
+    for file_path, _ in scan_tree(str(lib_dir)):
+        if file_path.suffix in ['.a', '.lib'] and name in file_path.name.lower():
+            return file_path
+    return None
+
+def create_luajit_headers(version, output_dir, packager):
     """Create single platform-independent luajit headers zip (headers are identical across platforms)"""
     include_dir = '3rdparty/include/luajit-2.1'
     zip_name = f"luajit-cpp-{version}-headers.zip"
@@ -68,18 +322,23 @@ def create_luajit_headers(version, output_dir):
         print(f"Warning: {include_dir} does not exist, skipping")
         return None
     
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for root, dirs, files in os.walk(include_path):
-            for file in files:
-                file_path = Path(root) / file
-                # Put files directly at root, no include/ prefix
-                arcname = file
-                zipf.write(file_path, arcname)
-    
-    print(f"Created {zip_path}")
-    return zip_path
+    # Put files directly at root, no include/ prefix
+    return packager.add(zip_path, [(file_path.name, file_path) for file_path, _ in scan_tree(include_dir)])
+
+def create_lib_zips(zip_path, top_level_dir, library, release_name, debug_name, packager):
+    """Release zip plus the debug zip GradleRIO requires, sharing one compressed library"""
+    debug_zip_path = zip_path.parent / f"{zip_path.stem}debug.zip"
+    release, debug = [], []
+    if library is not None:
+        # Rename to standard names, e.g. libluajit.a (Unix) or luajit.lib (Windows)
+        ext = library.suffix
+        prefix = 'lib' if ext == '.a' else ''
+        release.append((f"{top_level_dir}/lib/{prefix}{release_name}{ext}", library))
+        debug.append((f"{top_level_dir}/lib/{prefix}{debug_name}{ext}", library))
+    packager.add(debug_zip_path, debug)
+    return packager.add(zip_path, release)
 
-def create_luajit_libs(version, platform, output_dir):
+def create_luajit_libs(version, platform, output_dir, packager):
     """Create luajit-cpp-{version}-{platform}static.zip with libraries and share files"""
     base_dir = '3rdparty' if platform_is_build(platform) else f'3rdparty/{platform}'
     zip_name = f"luajit-cpp-{version}-{platform}static.zip"
@@ -94,44 +353,14 @@ def create_luajit_libs(version, platform, output_dir):
         print(f"Warning: {base_dir} does not exist, skipping")
         return None
     
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        # Add library files (*.a, *.lib) to lib/
-        lib_dir = base_path / 'lib'
-        if lib_dir.exists():
-            for file_path in lib_dir.rglob('*'):
-                if file_path.is_file() and file_path.suffix in ['.a', '.lib'] and 'luajit' in file_path.name.lower():
-                    # Rename to standard name: libluajit.a (Unix) or luajit.lib (Windows)
-                    if file_path.suffix == '.a':
-                        arcname = os.path.join(top_level_dir, 'lib', 'libluajit.a')
-                    else:  # .lib
-                        arcname = os.path.join(top_level_dir, 'lib', 'luajit.lib')
-                    zipf.write(file_path, Path(arcname))
-                    break  # Only add the first matching file
-
-    # Create debug zip with libluajitd.a (GradleRIO requires debug zips)
-    import shutil
-    debug_zip_name = f"{zip_path.stem}debug.zip"
-    debug_zip_path = zip_path.parent / debug_zip_name
-    
-    # Create debug zip with renamed library
-    with zipfile.ZipFile(debug_zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        # Add library files as libluajitd.a (Unix) or luajitd.lib (Windows) for debug
-        lib_dir = base_path / 'lib'
-        if lib_dir.exists():
-            for file_path in lib_dir.rglob('*'):
-                if file_path.is_file() and file_path.suffix in ['.a', '.lib'] and 'luajit' in file_path.name.lower():
-                    if file_path.suffix == '.a':
-                        arcname = os.path.join(top_level_dir, 'lib', 'libluajitd.a')
-                    else:  # .lib
-                        arcname = os.path.join(top_level_dir, 'lib', 'luajitd.lib')
-                    zipf.write(file_path, Path(arcname))
-                    break  # Only add the first matching file
-
-    print(f"Created {debug_zip_path}")
-    print(f"Created {zip_path}")
-    return zip_path
+    library = find_library(base_path / 'lib', 'luajit')
+    return create_lib_zips(zip_path, top_level_dir, library, 'luajit', 'luajitd', packager)
+
+def create_tree_zip(zip_path, source, packager):
+    """Zip every file under source, keeping paths relative to it"""
+    return packager.add(zip_path, [(rel, file_path) for file_path, rel in scan_tree(str(source))])
 
-def create_luajit_modules(version, source_dir, output_dir):
+def create_luajit_modules(version, source_dir, output_dir, packager):
     """Create luajit-lua-{version}-modules.zip with LuaJIT provided modules"""
     zip_name = f"luajit-lua-{version}-modules.zip"
     zip_path = Path(output_dir) / zip_name
@@ -145,18 +374,9 @@ def create_luajit_modules(version, source_dir, output_dir):
         print(f"Warning: {lua_source} does not exist, skipping Lua bindings")
         return None
     
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        # Add all Lua files from build/lua/wpi and build/lua/luabot
-        for root, dirs, files in os.walk(lua_source):
-            for file in files:
-                file_path = Path(root) / file
-                rel_path = file_path.relative_to(lua_source)
-                zipf.write(file_path, rel_path)
-    
-    print(f"Created {zip_path}")
-    return zip_path
+    return create_tree_zip(zip_path, lua_source, packager)
 
-def create_luabot_headers(version, build_dir, source_dir, output_dir):
+def create_luabot_headers(version, build_dir, source_dir, output_dir, packager):
     """Create luabot-cpp-{version}-headers.zip with headers from build/include and include/"""
     zip_name = f"luabot-cpp-{version}-headers.zip"
     zip_path = Path(output_dir) / zip_name
@@ -164,33 +384,15 @@ def create_luabot_headers(version, build_dir, source_dir, output_dir):
     # Ensure output directory exists
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        # Add headers from build/include
-        build_include = Path(build_dir) / 'include'
-        if build_include.exists():
-            for root, dirs, files in os.walk(build_include):
-                for file in files:
-                    if not file.endswith('.in'):
-                        file_path = Path(root) / file
-                        rel_path = file_path.relative_to(build_include)
-                        arcname = rel_path
-                        zipf.write(file_path, arcname)
-        
-        # Add headers from include/
-        source_include = Path(source_dir) / 'include'
-        if source_include.exists():
-            for root, dirs, files in os.walk(source_include):
-                for file in files:
-                    if not file.endswith('.in'):
-                        file_path = Path(root) / file
-                        rel_path = file_path.relative_to(source_include)
-                        arcname = rel_path
-                        zipf.write(file_path, arcname)
-    
-    print(f"Created {zip_path}")
-    return zip_path
+    # Headers from build/include, then include/
+    entries = []
+    for include in [Path(build_dir) / 'include', Path(source_dir) / 'include']:
+        if include.exists():
+            entries += [(rel, file_path) for file_path, rel in scan_tree(str(include))
+                        if not rel.endswith('.in')]
+    return packager.add(zip_path, entries)
 
-def create_luabot_libs(version, platform, build_dir, output_dir):
+def create_luabot_libs(version, platform, build_dir, output_dir, packager):
     """Create luabot-cpp-{version}-{platform}static.zip with stub library"""
     zip_name = f"luabot-cpp-{version}-{platform}static.zip"
     zip_path = Path(output_dir) / zip_name
@@ -210,40 +412,87 @@ def create_luabot_libs(version, platform, build_dir, output_dir):
         print(f"Warning: {lib_source} does not exist, skipping")
         return None
     
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        # Add library files (*.a, *.lib) to lib/
-        if lib_source.exists():
-            for file_path in lib_source.rglob('*'):
-                if file_path.is_file() and file_path.suffix in ['.a', '.lib'] and 'luabot' in file_path.name.lower():
-                    # Rename to standard name: libluabot-stub.a (Unix) or luabot-stub.lib (Windows)
-                    if file_path.suffix == '.a':
-                        arcname = os.path.join(top_level_dir, 'lib', 'libluabot-stub.a')
-                    else:  # .lib
-                        arcname = os.path.join(top_level_dir, 'lib', 'luabot-stub.lib')
-                    zipf.write(file_path, Path(arcname))
-                    break  # Only add the first matching file
-
-    # Create debug zip with renamed library (GradleRIO requires debug zips)
-    debug_zip_name = f"{zip_path.stem}debug.zip"
-    debug_zip_path = zip_path.parent / debug_zip_name
-    
-    with zipfile.ZipFile(debug_zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        # Add library files as libluabot-stubd.a (Unix) or luabot-stubd.lib (Windows) for debug
-        if lib_source.exists():
-            for file_path in lib_source.rglob('*'):
-                if file_path.is_file() and file_path.suffix in ['.a', '.lib'] and 'luabot' in file_path.name.lower():
-                    if file_path.suffix == '.a':
-                        arcname = os.path.join(top_level_dir, 'lib', 'libluabot-stubd.a')
-                    else:  # .lib
-                        arcname = os.path.join(top_level_dir, 'lib', 'luabot-stubd.lib')
-                    zipf.write(file_path, Path(arcname))
-                    break  # Only add the first matching file
-    
-    print(f"Created {debug_zip_path}")
-    print(f"Created {zip_path}")
-    return zip_path
+    library = find_library(lib_source, 'luabot')
+    return create_lib_zips(zip_path, top_level_dir, library, 'luabot-stub', 'luabot-stubd', packager)
+
+BUNDLE_MODULE = 'luabot.bundle'
+
+def lua_modules(lua_source):
+    """(module name, path) of each .lua under lua_source, as require finds them"""
+    modules = {}
+    # ?.lua comes before ?/init.lua on package.path
+    for init in (False, True):
+        for file_path, rel in scan_tree(str(lua_source)):
+            if not rel.endswith('.lua') or rel.endswith('/init.lua') != init:
+                continue
+            name = rel[:-len('/init.lua')] if init else rel[:-len('.lua')]
+            name = name.replace('/', '.')
+            if name != BUNDLE_MODULE and not name.startswith(BUNDLE_MODULE + '.'):
+                modules.setdefault(name, file_path)
+    return sorted(modules.items())
+
+def bundle_source(modules):
+    """One Lua chunk registering every module as a package.preload loader"""
+    out = ['-- Generated by vendordep.py, do not edit\n',
+           'local preload = package.preload\n\n']
+    for name, file_path in modules:
+        src = Path(file_path).read_text()
+        if src.startswith('#'):
+            # Lua skips a first line starting with # (shebang), a function body can't
+            src = '--' + src
+        out.append(f"preload['{name}'] = function (...)\n{src}\nend\n\n")
+    out.append('return {\n    modules = {\n')
+    out += [f"        '{name}',\n" for name, _ in modules]
+    out.append('    }\n}\n')
+    return ''.join(out)
+
+# Whether each platform's LuaJIT uses two-slot frames (GC64, bytecode
+# flag FR2). Bytecode only loads on a LuaJIT with the same setting.
+BYTECODE_FR2 = {
+    'linuxathena': False,
+    'linuxx86-64': True,
+    'windowsx86-64': True,
+    'osxuniversal': True,
+}
+BCDUMP_F_BE = 0x01
+BCDUMP_F_FR2 = 0x08
+
+def bundle_module(target):
+    """Bundle module for a platform, luabot.h requires the one it was built for"""
+    return f"{BUNDLE_MODULE}.{target}"
 
-def create_luabot_modules(version, build_dir, output_dir):
+def check_bytecode(bytecode, target):
+    """Raise ValueError unless a LuaJIT bytecode dump loads on target"""
+    if len(bytecode) < 5 or bytecode[:3] != b'\x1bLJ':
+        raise ValueError("Not a LuaJIT bytecode dump")
+    flags = bytecode[4]
+    if flags & BCDUMP_F_BE:
+        raise ValueError(f"Big endian bytecode can't load on {target}")
+    if bool(flags & BCDUMP_F_FR2) != BYTECODE_FR2[target]:
+        have = 'GC64' if flags & BCDUMP_F_FR2 else 'non GC64'
+        want = 'GC64' if BYTECODE_FR2[target] else 'non GC64'
+        raise ValueError(f"Bytecode is {have} but {target} needs {want}, use a LuaJIT built for it with --luajit")
+
+def compile_bundle(luajit, modules, target):
+    """Stripped LuaJIT bytecode of bundle_source(modules) for target.
+
+    Bytecode must match the target's format, for the roboRIO that is a
+    LuaJIT built without GC64 such as the 32-bit host build
+    (HOST_CC="gcc -m32"), not the x86-64 desktop one. A mismatch fails
+    here instead of on the robot.
+    """
+    import subprocess
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        src = Path(tmp) / 'bundle.lua'
+        out = Path(tmp) / 'bundle.bc'
+        src.write_text(bundle_source(modules))
+        subprocess.run([luajit, '-b', '-s', '-t', 'raw', str(src), str(out)], check=True)
+        bytecode = out.read_bytes()
+    check_bytecode(bytecode, target)
+    return bytecode
+
+def create_luabot_modules(version, build_dir, output_dir, packager, luajit=None, target='linuxathena'):
     """Create luabot-lua-{version}-modules.zip with WPILib Lua bindings"""
     zip_name = f"luabot-lua-{version}-modules.zip"
     zip_path = Path(output_dir) / zip_name
@@ -257,16 +506,23 @@ def create_luabot_modules(version, build_dir, output_dir):
         print(f"Warning: {lua_source} does not exist, skipping Lua bindings")
         return None
     
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        # Add all Lua files from build/lua/wpi and build/lua/luabot
-        for root, dirs, files in os.walk(lua_source):
-            for file in files:
-                file_path = Path(root) / file
-                rel_path = file_path.relative_to(lua_source)
-                zipf.write(file_path, rel_path)
-    
-    print(f"Created {zip_path}")
-    return zip_path
+    # All Lua files from build/lua/wpi and build/lua/luabot
+    entries = [(rel, file_path) for file_path, rel in scan_tree(str(lua_source))]
+    if luajit is not None:
+        # Preloaded ahead of the sources, which stay as a fallback. Other
+        # platforms don't look for this target's bundle.
+        bundle = compile_bundle(luajit, lua_modules(lua_source), target)
+        entries.append((bundle_module(target).replace('.', '/') + '.lua', bundle))
+    return packager.add(zip_path, entries)
+
+def write_text(path, content):
+    """Write content to path unless it already holds exactly that"""
+    if path.exists() and path.read_text() == content:
+        print(f"Up to date {path}")
+        return False
+    write_atomic(path, content)
+    print(f"Created {path}")
+    return True
 
 def generate_pom (version, file, artifact_id, output_dir):
     """Generate POM files from template"""
@@ -288,10 +544,7 @@ def generate_pom (version, file, artifact_id, output_dir):
     
     # Write POM file
     pom_path = Path(output_dir) / f'{artifact_id}-{version}.pom'
-    with open(pom_path, 'w') as f:
-        f.write(pom_content)
-    
-    print(f"Created {pom_path}")
+    write_checksums(pom_path, force=write_text(pom_path, pom_content))
     return pom_path
 
 def generate_luabot_json(version, github_repo, source_dir, output_dir):
@@ -315,10 +568,7 @@ def generate_luabot_json(version, github_repo, source_dir, output_dir):
     
     # Write JSON file
     json_path = Path(output_dir) / 'LuaBot.json'
-    with open(json_path, 'w') as f:
-        f.write(json_content)
-    
-    print(f"Created {json_path}")
+    write_text(json_path, json_content)
     return json_path
 
 def install_artifact(artifact_id, version, prefix, output_dir):
@@ -327,18 +577,58 @@ def install_artifact(artifact_id, version, prefix, output_dir):
     
     Path(artifact_dir).mkdir(parents=True, exist_ok=True)
     
-    # Find and copy matching files
+    # Find matching files and install the ones that changed
     source_path = Path(output_dir)
     pattern = f"{artifact_id}-{version}*.*"
     
-    import shutil
-    for file_path in source_path.glob(pattern):
-        if file_path.is_file():
-            dest_path = Path(artifact_dir) / file_path.name
-            shutil.copy2(file_path, dest_path)
-            print(f"Installed {file_path.name} to {artifact_dir}")
+    manifest = Manifest(source_path / MANIFEST_NAME)
+    for file_path in sorted(source_path.glob(pattern)):
+        if not file_path.is_file() or file_path.name.endswith('.tmp'):
+            continue
+        dest_path = Path(artifact_dir) / file_path.name
+        if same_content(file_path, dest_path, manifest):
+            continue
+        how = install_file(file_path, dest_path)
+        print(f"Installed {file_path.name} to {artifact_dir} ({how})")
 
-def create_stub_libs(artifact_name, version, platform, output_dir):
+def same_content(src, dst, manifest):
+    """True if dst is src, or a file with the same sha256"""
+    if not dst.exists():
+        return False
+    if os.path.samefile(src, dst):
+        return True
+    if src.stat().st_size != dst.stat().st_size:
+        return False
+    return (manifest.sha256(src) or file_digest(src)) == file_digest(dst)
+
+def reflink(src, dst):
+    """Copy-on-write clone of src, on filesystems that support FICLONE"""
+    import fcntl
+    FICLONE = 0x40049409
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+    shutil.copystat(src, dst)
+
+def install_file(src, dst):
+    """Place src at dst by reflink, hardlink or copy, whichever works first.
+
+    Every output is replaced atomically when rebuilt (write_zip and
+    write_atomic), so a hardlinked install keeps its content until the
+    next install and never sees a partial write.
+    """
+    tmp = dst.with_name(f"{dst.name}.{os.getpid()}.tmp")
+    for how, link in [('reflink', reflink), ('hardlink', os.link), ('copy', shutil.copy2)]:
+        try:
+            link(src, tmp)
+        except (OSError, ImportError):
+            if tmp.exists():
+                tmp.unlink()
+            continue
+        os.replace(tmp, dst)
+        return how
+    raise OSError(f"Could not install {src} to {dst}")
+
+def create_stub_libs(artifact_name, version, platform, output_dir, packager):
     """Create stub/empty library zips for platforms without local builds"""
     zip_name = f"{artifact_name}-{version}-{platform}static.zip"
     zip_path = Path(output_dir) / zip_name
@@ -346,20 +636,10 @@ def create_stub_libs(artifact_name, version, platform, output_dir):
     
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     
-    # Create empty zip with directory structure
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        # Add empty lib directory
-        zipf.writestr(f"{top_level_dir}/lib/.keep", "")
-    
-    # Create debug variant
-    debug_zip_name = f"{zip_path.stem}debug.zip"
-    debug_zip_path = zip_path.parent / debug_zip_name
-    
-    with zipfile.ZipFile(debug_zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        zipf.writestr(f"{top_level_dir}/lib/.keep", "")
-    
-    print(f"Created stub {zip_path}")
-    print(f"Created stub {debug_zip_path}")
+    # Empty zip with directory structure, plus a debug variant
+    debug_zip_path = zip_path.parent / f"{zip_path.stem}debug.zip"
+    packager.add(zip_path, [(f"{top_level_dir}/lib/.keep", b"")])
+    packager.add(debug_zip_path, [(f"{top_level_dir}/lib/.keep", b"")])
     return zip_path
 
 def install (args):
@@ -386,25 +666,33 @@ def main():
     parser.add_argument('--stubs', action='store_true', help='Generate stub zips for platforms without local builds (for local dev/testing)')
     parser.add_argument('--cross', action='store_true', help='Generate artifacts for cross platforms')
     parser.add_argument('--local', action='store_true', help='Generate local binary artifacts only')
+    parser.add_argument('--bytecode', action='store_true', help=f'Add {BUNDLE_MODULE}.TARGET, every module as preloaded LuaJIT bytecode, to the luabot-lua modules zip')
+    parser.add_argument('--luajit', default='luajit', help='LuaJIT used by --bytecode, it must produce bytecode for --target (default: luajit)')
+    parser.add_argument('--target', default='linuxathena', choices=sorted(BYTECODE_FR2), help='Platform the --bytecode bundle is for (default: linuxathena)')
+    parser.add_argument('--force', action='store_true', help='Rebuild every zip, ignoring the artifact manifest')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='Threads used to compress and write zips (default: one per CPU)')
 
     args = parser.parse_args()
     
     if args.install: return install (args)
     
+    manifest = Manifest(Path(args.output_dir) / MANIFEST_NAME, fresh=args.force)
+    packager = Packager(args.jobs, manifest)
     if not args.local:
         # Generate LuaBot.json
         generate_luabot_json (args.version, args.github_repo, args.source_dir, args.output_dir)
         
         # Create headers zip
-        create_luabot_headers(args.version, args.build_dir, args.source_dir, args.output_dir)
-        create_luabot_modules(args.version, args.build_dir, args.output_dir)
+        create_luabot_headers(args.version, args.build_dir, args.source_dir, args.output_dir, packager)
+        create_luabot_modules(args.version, args.build_dir, args.output_dir, packager,
+                              args.luajit if args.bytecode else None, args.target)
         pom_template = os.path.join (args.source_dir, 'vendordep', 'luabot.pom.in')
         for artifact_id in ['luabot-cpp', 'luabot-lua']:
             generate_pom (args.version, pom_template, artifact_id, args.output_dir)
 
         # Create single headers zip (platform-independent)
-        create_luajit_headers(LUAJIT_VERSION, args.output_dir)
-        create_luajit_modules(LUAJIT_VERSION, args.source_dir, args.output_dir)
+        create_luajit_headers(LUAJIT_VERSION, args.output_dir, packager)
+        create_luajit_modules(LUAJIT_VERSION, args.source_dir, args.output_dir, packager)
         pom_template = os.path.join(args.source_dir, 'vendordep', 'luajit.pom.in')
         for artifact_id in ['luajit-cpp', 'luajit-lua']:
             generate_pom (LUAJIT_VERSION, pom_template, artifact_id, args.output_dir)
@@ -415,15 +703,18 @@ def main():
         built_platforms.append('linuxathena')
     
     for platform in built_platforms:
-        create_luajit_libs(LUAJIT_VERSION, platform, args.output_dir)
-        create_luabot_libs(args.version, platform, args.build_dir, args.output_dir)
+        create_luajit_libs(LUAJIT_VERSION, platform, args.output_dir, packager)
+        create_luabot_libs(args.version, platform, args.build_dir, args.output_dir, packager)
     
     # Create stub zips for platforms we don't have binaries for (only if --stubs and not --local)
     if args.stubs and not args.local:
         missing_platforms = [p for p in PLATFORMS if p not in built_platforms]
         for platform in missing_platforms:
-            create_stub_libs('luajit-cpp', LUAJIT_VERSION, platform, args.output_dir)
-            create_stub_libs('luabot-cpp', args.version, platform, args.output_dir)
+            create_stub_libs('luajit-cpp', LUAJIT_VERSION, platform, args.output_dir, packager)
+            create_stub_libs('luabot-cpp', args.version, platform, args.output_dir, packager)
+
+    # Every zip queued above is compressed and written here, in parallel
+    packager.run()
     return 0
 
 if __name__ == '__main__':